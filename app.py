@@ -1,82 +1,394 @@
 import streamlit as st
-import httpx
+import functools
+import hashlib
+import hmac
+import io
 import json
 import os
-from dotenv import load_dotenv
+import sys
+import threading
+import time
+import uuid
+import zlib
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from types import MappingProxyType
 
-load_dotenv()
+# Heavier modules (httpx, python-dotenv) are imported where first
+# used, so a new worker process only pays for them when they are actually needed.
+
+@st.cache_resource
+def load_environment():
+    """
+    Load .env once per process instead of on every script rerun.
+    """
+    from dotenv import load_dotenv
+    load_dotenv()
+
+load_environment()
+
+@st.cache_resource
+def get_static_tables():
+    """
+    Lookup tables that never change, built once per process and shared by all
+    sessions and reruns. The tables are returned as read-only mappings of tuples,
+    so no session can modify what the others see.
+    """
+    # Map user profiles to dietary requirements; UI labels carry an emoji prefix
+    dietary_requirements = {
+        "Standard Healthy Eating": ("🥗", "Focus on whole foods, balanced nutrition, lean proteins, whole grains, and plenty of vegetables. Avoid processed foods."),
+        "Low-Sugar/Pre-Diabetic Friendly": ("🍃", "Low glycemic index foods only. NO added sugars, NO refined carbohydrates, NO white bread/pasta/rice. Focus on complex carbs, lean proteins, and non-starchy vegetables."),
+        "Vegetarian": ("🌱", "No meat or fish. Include diverse plant proteins (legumes, tofu, tempeh, quinoa). Ensure complete proteins and adequate B12, iron, and omega-3 sources."),
+        "Gluten-Free": ("🌾", "Absolutely NO wheat, barley, rye, or cross-contaminated oats. Use rice, quinoa, corn, certified gluten-free oats, and other safe grains.")
+    }
+    profile_map = {}
+    for profile, (emoji, requirements) in dietary_requirements.items():
+        profile_map[profile] = requirements
+        profile_map[f"{emoji} {profile}"] = requirements
+    
+    # Ingredient categorization for grocery lists (first matching category wins)
+    grocery_categories = {
+        "Produce": ["tomato", "onion", "garlic", "bell pepper", "spinach", "lettuce", "carrot", "celery", 
+                   "cucumber", "avocado", "lemon", "lime", "apple", "banana", "berry", "broccoli", 
+                   "zucchini", "mushroom", "potato", "sweet potato", "herbs", "parsley", "cilantro",
+                   "basil", "arugula", "kale", "cabbage", "cauliflower", "asparagus", "green beans"],
+        
+        "Proteins": ["chicken", "beef", "pork", "fish", "salmon", "tuna", "shrimp", "eggs", "tofu", 
+                    "tempeh", "beans", "lentils", "chickpeas", "quinoa", "nuts", "almonds", "walnuts",
+                    "peanuts", "seeds", "chia", "hemp", "turkey", "lamb"],
+        
+        "Dairy": ["milk", "cheese", "yogurt", "butter", "cream", "sour cream", "cottage cheese",
+                 "mozzarella", "parmesan", "feta", "ricotta", "greek yogurt"],
+        
+        "Grains & Pantry": ["rice", "bread", "pasta", "flour", "oats", "cereal", "crackers", "oil",
+                           "olive oil", "coconut oil", "vinegar", "soy sauce", "salt", "pepper", 
+                           "spices", "honey", "maple syrup", "stock", "broth", "canned tomatoes",
+                           "coconut milk", "tahini", "peanut butter", "vanilla", "baking powder"],
+        
+        "Frozen": ["frozen vegetables", "frozen fruit", "frozen berries", "ice"],
+        
+        "Other": []  # Catch-all category
+    }
+    
+    category_emoji = {
+        "Produce": "🥬",
+        "Proteins": "🥩", 
+        "Dairy": "🥛",
+        "Grains & Pantry": "🌾",
+        "Frozen": "🧊",
+        "Other": "📦"
+    }
+    
+    model_options = {
+        "auto": "Auto - Cheapest model meeting the speed target",
+        "gpt-4o-mini": "GPT-4o Mini - Fast & Cost-effective",
+        "gpt-4o": "GPT-4o - Balanced Performance", 
+        "gpt-4-turbo": "GPT-4 Turbo - High Quality",
+        "gpt-3.5-turbo": "GPT-3.5 Turbo - Basic & Speedy"
+    }
+    
+    return MappingProxyType({
+        "profile_map": MappingProxyType(profile_map),
+        "grocery_categories": MappingProxyType(
+            {category: tuple(keywords) for category, keywords in grocery_categories.items()}
+        ),
+        "category_emoji": MappingProxyType(category_emoji),
+        "model_options": MappingProxyType(model_options)
+    })
+
+STATIC_TABLES = get_static_tables()
+GROCERY_CATEGORIES = STATIC_TABLES["grocery_categories"]
+
+# Opt-in profiling: HEALTHYMEALS_PROFILE=1 profiles every rerun for every session;
+# otherwise a hidden sidebar toggle enables it per session. The toggle is only shown
+# when the page is opened with ?debug=<HEALTHYMEALS_DEBUG_TOKEN>, so anonymous
+# visitors cannot start profiling or make the server write files.
+PROFILE_ENV_ENABLED = os.getenv("HEALTHYMEALS_PROFILE", "").lower() in ("1", "true", "yes")
+PROFILE_DEBUG_TOKEN = os.getenv("HEALTHYMEALS_DEBUG_TOKEN", "")
+PROFILE_SAMPLE_INTERVAL = 0.002  # seconds between stack samples
+PROFILE_MAX_SECONDS = 300  # a sampler still running after this long gives up
+
+class RerunProfiler:
+    """
+    Profiles Streamlit script reruns for one session.
+    
+    Each rerun gets lap timings for the major page sections, wall times for
+    the pipeline functions and a statistical profile: a background thread
+    samples the Python stack of this session's script thread only, so other
+    sessions running at the same time never show up in the capture. When the
+    rerun ends, a collapsed-stack .folded file (for a flame graph) and a text
+    report with the top-N hotspots are written to `output_dir/<session>/`.
+    
+    If the rerun never reaches finish() (it raised, or the session closed),
+    the sampler notices the script thread has exited and finishes by itself.
+    """
+    
+    def __init__(self, output_dir, top_n=25):
+        self.output_dir = Path(output_dir) / uuid.uuid4().hex[:8]
+        self.top_n = top_n
+        self.rerun_count = 0
+        self.active = False
+        self.last_report = None
+        self._finish_lock = threading.Lock()
+        self._sampler = None
+    
+    def start(self, stage):
+        """
+        Begin profiling a rerun that starts in `stage`.
+        """
+        if self._sampler is not None:
+            self._sampler.join()  # Let a sampler finishing the previous rerun write its report
+        self.rerun_count += 1
+        self.start_stage = stage
+        self.started_at = time.perf_counter()
+        self.lap_started_at = self.started_at
+        self.laps = []
+        self.function_times = []
+        self.samples = {}
+        self.active = True
+        
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(
+            target=self._sample, args=(threading.get_ident(), self._stop),
+            name="rerun-profiler", daemon=True
+        )
+        self._sampler.start()
+    
+    def _sample(self, thread_id, stop):
+        """
+        Record the script thread's stack until the rerun finishes or the thread exits.
+        Each sample is weighted by the time since the previous one, because the
+        sampler only runs when the script thread releases the GIL.
+        """
+        deadline = time.monotonic() + PROFILE_MAX_SECONDS
+        last = time.perf_counter()
+        while not stop.wait(PROFILE_SAMPLE_INTERVAL):
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                self.finish("(script stopped early)")
+                return
+            if time.monotonic() > deadline:
+                self.finish("(profiling timed out)")
+                return
+            now = time.perf_counter()
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_qualname} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if self.active:
+                stack = tuple(reversed(stack))
+                self.samples[stack] = self.samples.get(stack, 0.0) + (now - last)
+            last = now
+    
+    def lap(self, name):
+        """
+        Record the time since the previous lap (or rerun start) under `name`.
+        """
+        if not self.active:
+            return
+        now = time.perf_counter()
+        self.laps.append((name, now - self.lap_started_at))
+        self.lap_started_at = now
+    
+    def finish(self, end_stage):
+        """
+        Stop profiling and write this rerun's artifacts. Safe to call from
+        both the script thread and the sampler; only the first call counts.
+        """
+        with self._finish_lock:
+            if not self.active:
+                return
+            self.lap("rest of rerun")
+            self.active = False
+        total = time.perf_counter() - self.started_at
+        
+        self._stop.set()
+        if threading.current_thread() is not self._sampler:
+            self._sampler.join()
+        
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        name = f"{datetime.now():%Y%m%d-%H%M%S}-{self.rerun_count:04d}-{self.start_stage}"
+        
+        report = io.StringIO()
+        report.write(f"Rerun {self.rerun_count}: {self.start_stage} -> {end_stage}, {total * 1000:.1f} ms total\n\n")
+        report.write("Sections:\n")
+        for lap_name, seconds in self.laps:
+            report.write(f"  {seconds * 1000:10.1f} ms  {lap_name}\n")
+        report.write("\nPipeline functions:\n")
+        for func_name, seconds in self.function_times or [("(none called)", 0.0)]:
+            report.write(f"  {seconds * 1000:10.1f} ms  {func_name}\n")
+        
+        own, cumulative = {}, {}
+        for stack, seconds in self.samples.items():
+            own[stack[-1]] = own.get(stack[-1], 0.0) + seconds
+            for frame_name in set(stack):
+                cumulative[frame_name] = cumulative.get(frame_name, 0.0) + seconds
+        for title, totals in (("own time", own), ("cumulative time", cumulative)):
+            report.write(f"\nTop {self.top_n} hotspots by {title} (sampled):\n")
+            for frame_name, seconds in sorted(totals.items(), key=lambda item: item[1], reverse=True)[:self.top_n]:
+                report.write(f"  {seconds * 1000:10.1f} ms  {frame_name}\n")
+        
+        (self.output_dir / f"{name}.folded").write_text(
+            # Collapsed-stack format; the count is microseconds of sampled time
+            "".join(f"{';'.join(stack)} {round(seconds * 1_000_000)}\n" for stack, seconds in self.samples.items())
+        )
+        (self.output_dir / f"{name}.txt").write_text(report.getvalue())
+        self.last_report = {"name": name, "total": total, "laps": list(self.laps),
+                            "functions": list(self.function_times)}
+
+def profile_toggle_unlocked():
+    """
+    Whether this page was opened with the debug token that unlocks the profiling toggle.
+    """
+    token = st.query_params.get("debug", "")
+    # Compare bytes: compare_digest rejects non-ASCII str arguments
+    return bool(PROFILE_DEBUG_TOKEN) and hmac.compare_digest(token.encode(), PROFILE_DEBUG_TOKEN.encode())
+
+def active_profiler():
+    """
+    The current session's profiler if this rerun is being profiled, else None.
+    """
+    profiler = st.session_state.get("rerun_profiler")
+    return profiler if profiler is not None and profiler.active else None
+
+def profile_rerun_start():
+    """
+    Start profiling this rerun if profiling is enabled for the session.
+    A rerun that ended through st.rerun() never reaches profile_rerun_end(),
+    so its profile is closed here, at the start of the rerun that replaces it.
+    """
+    profiler = st.session_state.get("rerun_profiler")
+    if profiler is not None and profiler.active:
+        profiler.finish(st.session_state.get("stage", "onboarding"))
+    
+    if not (PROFILE_ENV_ENABLED or (st.session_state.get("profile_reruns") and profile_toggle_unlocked())):
+        return
+    if profiler is None:
+        profiler = RerunProfiler(
+            os.getenv("HEALTHYMEALS_PROFILE_DIR", "profiles"),
+            top_n=int(os.getenv("HEALTHYMEALS_PROFILE_TOP_N", "25"))
+        )
+        st.session_state.rerun_profiler = profiler
+    profiler.start(st.session_state.get("stage", "onboarding"))
+
+def profile_lap(name):
+    """
+    Mark the end of a page section in the current rerun's profile.
+    """
+    profiler = active_profiler()
+    if profiler is not None:
+        profiler.lap(name)
+
+def profile_rerun_end():
+    """
+    Finish profiling a rerun that ran to the end of the script.
+    """
+    profiler = active_profiler()
+    if profiler is not None:
+        profiler.finish(st.session_state.stage)
+
+def profiled(func):
+    """
+    Record the wall time of each call to a pipeline function in the rerun profile.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profiler = active_profiler()
+        if profiler is None:
+            return func(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.function_times.append((func.__qualname__, time.perf_counter() - start))
+    return wrapper
 
 # Core LLM functions for meal plan generation
+
+# Shape- and user-independent instructions. Sent first so every request shares the
+# longest possible identical prefix (after the constant system message).
+PROMPT_INSTRUCTIONS = """You are a professional nutritionist creating a personalized meal plan for a busy professional.
+
+Create a complete meal plan following these rules:
+1. Use ONLY whole, non-processed ingredients
+2. Each recipe should be completable in 45 minutes or less
+3. Provide variety - no recipe should repeat anywhere in the plan
+4. Include complete nutritional balance for each day
+5. Recipes should be practical for busy professionals
+6. Follow the DIETARY REQUIREMENTS and never use the EXCLUDED FOODS listed at the end of this message
+
+Return ONLY a valid JSON object with the exact structure given under JSON STRUCTURE below.
+Do not add explanations, comments or markdown formatting.
+"""
+
+@functools.lru_cache(maxsize=8)
+def build_prompt_prefix(num_days, meal_list):
+    """
+    Build the fixed part of the prompt for a plan shape (number of days, meals per day):
+    the shared instructions followed by the shape's meal list and JSON schema.
+    Contains no user-specific content, so it is byte-identical for every request with
+    the same shape. Memoized per shape.
+    """
+    days_list = ["monday"] if num_days == 1 else ["monday", "tuesday", "wednesday"]
+    meal_template = {
+        "name": "Recipe Name",
+        "prep_time": "X minutes",
+        "ingredients": ["ingredient 1", "ingredient 2"],
+        "instructions": ["step 1", "step 2"],
+        "calories": 0,
+        "protein": "00g"
+    }
+    json_template = json.dumps(
+        {"week_plan": {day: {meal: meal_template for meal in meal_list} for day in days_list}}
+    )
+    
+    return PROMPT_INSTRUCTIONS + f"""
+PLAN LENGTH: {num_days} day{'s' if num_days > 1 else ''}
+
+MEALS NEEDED PER DAY:
+{', '.join(meal_list)}
+
+JSON STRUCTURE:
+{json_template}
+"""
+
+@profiled
 def construct_llm_prompt(preferences):
     """
     Construct a detailed prompt for the LLM based on user preferences.
     Returns a string prompt that instructs the LLM to return JSON.
+    The shared instructions and schema come first; user-specific constraints are appended last.
     """
-    # Map user profiles to dietary requirements (handle emoji prefixes)
-    profile_map = {
-        "🥗 Standard Healthy Eating": "Focus on whole foods, balanced nutrition, lean proteins, whole grains, and plenty of vegetables. Avoid processed foods.",
-        "Standard Healthy Eating": "Focus on whole foods, balanced nutrition, lean proteins, whole grains, and plenty of vegetables. Avoid processed foods.",
-        "🍃 Low-Sugar/Pre-Diabetic Friendly": "Low glycemic index foods only. NO added sugars, NO refined carbohydrates, NO white bread/pasta/rice. Focus on complex carbs, lean proteins, and non-starchy vegetables.",
-        "Low-Sugar/Pre-Diabetic Friendly": "Low glycemic index foods only. NO added sugars, NO refined carbohydrates, NO white bread/pasta/rice. Focus on complex carbs, lean proteins, and non-starchy vegetables.",
-        "🌱 Vegetarian": "No meat or fish. Include diverse plant proteins (legumes, tofu, tempeh, quinoa). Ensure complete proteins and adequate B12, iron, and omega-3 sources.",
-        "Vegetarian": "No meat or fish. Include diverse plant proteins (legumes, tofu, tempeh, quinoa). Ensure complete proteins and adequate B12, iron, and omega-3 sources.",
-        "🌾 Gluten-Free": "Absolutely NO wheat, barley, rye, or cross-contaminated oats. Use rice, quinoa, corn, certified gluten-free oats, and other safe grains.",
-        "Gluten-Free": "Absolutely NO wheat, barley, rye, or cross-contaminated oats. Use rice, quinoa, corn, certified gluten-free oats, and other safe grains."
-    }
-    
-    dietary_requirements = profile_map.get(preferences['user_profile'], "")
+    dietary_requirements = STATIC_TABLES["profile_map"].get(preferences.get('user_profile', ''), "")
     excluded_foods = preferences.get('excluded_foods', '')
     plan_duration = preferences.get('plan_duration', '3-Day Meal Plan')
     meals_per_day = preferences.get('meals_per_day', 'Breakfast, Lunch, Dinner')
     
     # Determine which meals to include (handle emoji prefixes)
     if "Breakfast" in meals_per_day or "🌅" in meals_per_day:
-        meal_list = ["breakfast", "lunch", "dinner"]
+        meal_list = ("breakfast", "lunch", "dinner")
     else:
-        meal_list = ["lunch", "dinner"]
+        meal_list = ("lunch", "dinner")
     
-    # Determine number of days and day structure
-    if "1-Day" in plan_duration:
-        num_days = 1
-        days_structure = '"monday": { ... same structure ... }'
-        days_list = ["monday"]
-    else:  # 3-Day
-        num_days = 3
-        days_structure = '"monday": { ... same structure ... }, "tuesday": { ... same structure ... }, "wednesday": { ... same structure ... }'
-        days_list = ["monday", "tuesday", "wednesday"]
+    # Determine number of days
+    num_days = 1 if "1-Day" in plan_duration else 3
     
-    prompt = f"""You are a professional nutritionist creating a personalized {num_days}-day meal plan.
-
+    prompt = build_prompt_prefix(num_days, meal_list) + f"""
 DIETARY REQUIREMENTS:
 {dietary_requirements}
 
 EXCLUDED FOODS (must not appear in any recipe):
-{excluded_foods if excluded_foods else "None"}
-
-MEALS NEEDED PER DAY:
-{', '.join(meal_list)}
-
-Create a complete {num_days}-day meal plan following these rules:
-1. Use ONLY whole, non-processed ingredients
-2. Each recipe should be completable in 45 minutes or less
-3. Provide variety - no recipe should repeat{' across days' if num_days > 1 else ''}
-4. Include complete nutritional balance for each day
-5. Recipes should be practical for busy professionals
-
-Return ONLY a valid JSON object with this exact structure (no additional text):
-{{
-  "week_plan": {{
-    {days_structure.replace('{ ... same structure ... }', '{ ' + ', '.join([f'"{meal}": {{"name": "Recipe Name", "prep_time": "X minutes", "ingredients": ["ingredient 1", "ingredient 2"], "instructions": ["step 1", "step 2"], "calories": 000, "protein": "00g"}}' for meal in meal_list]) + ' }')}
-  }}
-}}
-
-Remember: Return ONLY the JSON object, no explanations or markdown formatting."""
+{excluded_foods if excluded_foods else "None"}"""
     
     return prompt
 
-def get_meal_plan_from_llm(prompt, model=None):
+@profiled
+def get_meal_plan_from_llm(prompt, model=None, stats=None):
     """
     Send prompt to LLM API and return the raw response.
+    If a dict is passed as `stats`, it is filled with timing and token usage for the call.
     """
     provider = os.getenv("LLM_PROVIDER", "openai")
     
@@ -89,7 +401,9 @@ def get_meal_plan_from_llm(prompt, model=None):
         if not api_key or api_key == "YOUR_OPENAI_API_KEY_HERE":
             return None, "Please add your OpenAI API key to .env file"
         
-        url = "https://api.openai.com/v1/chat/completions"
+        # Allow pointing at a compatible endpoint (e.g. a local mock for load testing)
+        base_url = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/")
+        url = f"{base_url}/chat/completions"
         
         headers = {
             "Content-Type": "application/json",
@@ -109,18 +423,58 @@ def get_meal_plan_from_llm(prompt, model=None):
                 }
             ],
             "temperature": 0.7,
-            "max_tokens": 4000
+            "max_tokens": 4000,
+            # Stream so time to first token can be measured; usage arrives in the final chunk
+            "stream": True,
+            "stream_options": {"include_usage": True}
         }
         
+        if stats is not None:
+            stats["request_sent"] = True
+        
         try:
+            start = time.perf_counter()
+            first_token_at = None
+            usage = {}
+            content_parts = []
+            
+            import httpx  # Deferred so cold start does not pay for it before the first plan
+            
             with httpx.Client() as client:
-                response = client.post(url, json=data, headers=headers, timeout=60.0)
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    return result['choices'][0]['message']['content'], None
-                else:
-                    return None, f"API Error: {response.status_code} - {response.text}"
+                with client.stream("POST", url, json=data, headers=headers, timeout=60.0) as response:
+                    if response.status_code != 200:
+                        if stats is not None:
+                            stats["status_code"] = response.status_code
+                        response.read()
+                        return None, f"API Error: {response.status_code} - {response.text}"
+                    
+                    for line in response.iter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        payload = line[len("data:"):].strip()
+                        if payload == "[DONE]":
+                            break
+                        
+                        chunk = json.loads(payload)
+                        if chunk.get("usage"):
+                            usage = chunk["usage"]
+                        for choice in chunk.get("choices", []):
+                            delta = choice.get("delta", {}).get("content")
+                            if delta:
+                                if first_token_at is None:
+                                    first_token_at = time.perf_counter()
+                                content_parts.append(delta)
+            
+            end = time.perf_counter()
+            if stats is not None:
+                stats["ttft"] = (first_token_at or end) - start
+                stats["latency"] = end - start
+                stats["prompt_tokens"] = usage.get("prompt_tokens", 0)
+                stats["completion_tokens"] = usage.get("completion_tokens", 0)
+                # Prompt tokens served from the provider's prefix cache
+                stats["cached_tokens"] = (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0)
+            
+            return "".join(content_parts), None
         except Exception as e:
             return None, f"Connection Error: {str(e)}"
     
@@ -128,95 +482,162 @@ def get_meal_plan_from_llm(prompt, model=None):
         # Gemini implementation would go here
         return None, "Gemini API not yet implemented"
 
-def generate_grocery_list(meal_plan):
+def normalize_ingredient(ingredient):
     """
-    Generate a consolidated grocery list from the meal plan.
-    Aggregates ingredients and categorizes them.
+    Reduce an ingredient line to its canonical form for deduplication.
+    Returns an empty string if nothing is left after cleaning.
     """
-    # Ingredient categorization
-    categories = {
-        "Produce": ["tomato", "onion", "garlic", "bell pepper", "spinach", "lettuce", "carrot", "celery", 
-                   "cucumber", "avocado", "lemon", "lime", "apple", "banana", "berry", "broccoli", 
-                   "zucchini", "mushroom", "potato", "sweet potato", "herbs", "parsley", "cilantro",
-                   "basil", "arugula", "kale", "cabbage", "cauliflower", "asparagus", "green beans"],
-        
-        "Proteins": ["chicken", "beef", "pork", "fish", "salmon", "tuna", "shrimp", "eggs", "tofu", 
-                    "tempeh", "beans", "lentils", "chickpeas", "quinoa", "nuts", "almonds", "walnuts",
-                    "peanuts", "seeds", "chia", "hemp", "turkey", "lamb"],
-        
-        "Dairy": ["milk", "cheese", "yogurt", "butter", "cream", "sour cream", "cottage cheese",
-                 "mozzarella", "parmesan", "feta", "ricotta", "greek yogurt"],
-        
-        "Grains & Pantry": ["rice", "bread", "pasta", "flour", "oats", "cereal", "crackers", "oil",
-                           "olive oil", "coconut oil", "vinegar", "soy sauce", "salt", "pepper", 
-                           "spices", "honey", "maple syrup", "stock", "broth", "canned tomatoes",
-                           "coconut milk", "tahini", "peanut butter", "vanilla", "baking powder"],
-        
-        "Frozen": ["frozen vegetables", "frozen fruit", "frozen berries", "ice"],
-        
-        "Other": []  # Catch-all category
-    }
+    # Basic cleaning - remove quantities and common prefixes
+    clean_ingredient = ingredient.lower().strip()
+    # Remove common quantity indicators
+    clean_ingredient = clean_ingredient.replace("cups of", "").replace("cup of", "")
+    clean_ingredient = clean_ingredient.replace("tablespoons of", "").replace("tablespoon of", "")
+    clean_ingredient = clean_ingredient.replace("teaspoons of", "").replace("teaspoon of", "")
+    clean_ingredient = clean_ingredient.replace("ounces of", "").replace("ounce of", "")
+    clean_ingredient = clean_ingredient.replace("pounds of", "").replace("pound of", "")
+    clean_ingredient = clean_ingredient.replace("slices of", "").replace("slice of", "")
+    clean_ingredient = clean_ingredient.replace("pieces of", "").replace("piece of", "")
+    clean_ingredient = clean_ingredient.replace("cloves of", "").replace("clove of", "")
+    return clean_ingredient.strip()
+
+def match_category(cleaned):
+    """
+    Return the first grocery category with a keyword in the canonical ingredient.
+    """
+    for category, keywords in GROCERY_CATEGORIES.items():
+        if any(keyword in cleaned for keyword in keywords):
+            return category
+    return "Other"
+
+CATEGORY_CACHE_SIZE = 4096  # distinct canonical ingredients remembered per process
+
+@st.cache_resource
+def get_category_lookup():
+    """
+    Process-wide memoized match_category, shared by all sessions. Bounded LRU,
+    because ingredient lines are free text from the LLM and never stop varying.
+    """
+    return functools.lru_cache(maxsize=CATEGORY_CACHE_SIZE)(match_category)
+
+CATEGORY_LOOKUP = get_category_lookup()
+
+def categorize_ingredient(cleaned):
+    """
+    Return the grocery category for a canonical ingredient.
+    """
+    return CATEGORY_LOOKUP(cleaned)
+
+class GroceryIndex:
+    """
+    Incrementally maintained grocery list for a meal plan.
+    
+    Reference-counts each canonical ingredient across meals, so adding or
+    removing one meal only touches that meal's ingredients instead of
+    rescanning the whole plan. Meals are keyed by (day, meal_type) and keep
+    their position in the plan when replaced, so each ingredient is shown
+    with its first spelling in plan order, exactly as a full rebuild would.
+    """
+    
+    def __init__(self):
+        # (day, meal_type) -> [(canonical, original, position), ...] as added
+        self._meals = {}
+        # (day, meal_type) -> sequence number giving the meal's position in the plan
+        self._meal_seq = {}
+        # canonical -> {(meal seq, ingredient index): original}; the earliest is displayed
+        self._ingredients = {}
+        # canonical -> category, and category -> set of canonicals currently referenced
+        self._category_of = {}
+        self._by_category = {category: set() for category in GROCERY_CATEGORIES}
+    
+    @classmethod
+    @profiled
+    def from_meal_plan(cls, meal_plan):
+        """
+        Build an index covering every meal in the plan.
+        """
+        index = cls()
+        for day_name, day_meals in meal_plan["week_plan"].items():
+            for meal_name, meal_data in day_meals.items():
+                index.add_meal(day_name, meal_name, meal_data)
+        return index
     
-    # Collect all ingredients
-    ingredients = []
-    
-    for day_name, day_meals in meal_plan["week_plan"].items():
-        for meal_name, meal_data in day_meals.items():
-            if "ingredients" in meal_data:
-                ingredients.extend(meal_data["ingredients"])
-    
-    # Clean and normalize ingredients
-    cleaned_ingredients = []
-    for ingredient in ingredients:
-        # Basic cleaning - remove quantities and common prefixes
-        clean_ingredient = ingredient.lower().strip()
-        # Remove common quantity indicators
-        clean_ingredient = clean_ingredient.replace("cups of", "").replace("cup of", "")
-        clean_ingredient = clean_ingredient.replace("tablespoons of", "").replace("tablespoon of", "")
-        clean_ingredient = clean_ingredient.replace("teaspoons of", "").replace("teaspoon of", "")
-        clean_ingredient = clean_ingredient.replace("ounces of", "").replace("ounce of", "")
-        clean_ingredient = clean_ingredient.replace("pounds of", "").replace("pound of", "")
-        clean_ingredient = clean_ingredient.replace("slices of", "").replace("slice of", "")
-        clean_ingredient = clean_ingredient.replace("pieces of", "").replace("piece of", "")
-        clean_ingredient = clean_ingredient.replace("cloves of", "").replace("clove of", "")
-        clean_ingredient = clean_ingredient.strip()
-        
-        if clean_ingredient:
-            cleaned_ingredients.append((ingredient, clean_ingredient))  # Keep original for display
-    
-    # Remove duplicates while preserving original formatting
-    unique_ingredients = {}
-    for original, cleaned in cleaned_ingredients:
-        if cleaned not in unique_ingredients:
-            unique_ingredients[cleaned] = original
-    
-    # Categorize ingredients
-    categorized_list = {category: [] for category in categories.keys()}
-    
-    for cleaned, original in unique_ingredients.items():
-        categorized = False
-        for category, keywords in categories.items():
-            if category == "Other":
+    def add_meal(self, day, meal_type, meal_data):
+        """
+        Add a meal's ingredients. A meal already stored under the same key is
+        replaced in place; a new key goes after every existing meal.
+        """
+        key = (day, meal_type)
+        if key in self._meals:
+            self.remove_meal(day, meal_type)
+        seq = self._meal_seq.setdefault(key, len(self._meal_seq))
+        
+        entries = []
+        for i, original in enumerate(meal_data.get("ingredients", [])):
+            cleaned = normalize_ingredient(original)
+            if not cleaned:
                 continue
-            for keyword in keywords:
-                if keyword in cleaned:
-                    categorized_list[category].append(original)
-                    categorized = True
-                    break
-            if categorized:
-                break
+            position = (seq, i)
+            entries.append((cleaned, original, position))
+            
+            occurrences = self._ingredients.get(cleaned)
+            if occurrences is None:
+                occurrences = self._ingredients[cleaned] = {}
+                category = self._category_of[cleaned] = categorize_ingredient(cleaned)
+                self._by_category[category].add(cleaned)
+            occurrences[position] = original
         
-        if not categorized:
-            categorized_list["Other"].append(original)
+        self._meals[key] = entries
+    
+    def remove_meal(self, day, meal_type):
+        """
+        Drop a meal's ingredients; ingredients no other meal uses leave the list.
+        The meal's position is kept in case it is added back.
+        """
+        for cleaned, original, position in self._meals.pop((day, meal_type), []):
+            occurrences = self._ingredients[cleaned]
+            del occurrences[position]
+            if not occurrences:
+                del self._ingredients[cleaned]
+                self._by_category[self._category_of[cleaned]].discard(cleaned)
+    
+    def replace_meal(self, day, meal_type, meal_data):
+        """
+        Swap one meal for another (e.g. after regenerating a single recipe).
+        """
+        self.add_meal(day, meal_type, meal_data)
     
-    # Remove empty categories and sort ingredients
-    final_list = {}
-    for category, items in categorized_list.items():
-        if items:
-            final_list[category] = sorted(set(items))
+    def total_items(self):
+        """
+        Number of distinct ingredients on the list.
+        """
+        return len(self._ingredients)
     
-    return final_list
+    def _display_name(self, cleaned):
+        """
+        The spelling of an ingredient that appears first in plan order.
+        """
+        occurrences = self._ingredients[cleaned]
+        return occurrences[min(occurrences)]
+    
+    def as_dict(self):
+        """
+        Grocery list as {category: sorted items}, omitting empty categories.
+        """
+        final_list = {}
+        for category, canonicals in self._by_category.items():
+            if canonicals:
+                final_list[category] = sorted({self._display_name(c) for c in canonicals})
+        return final_list
+
+@profiled
+def generate_grocery_list(meal_plan):
+    """
+    Generate a consolidated grocery list from the meal plan.
+    Aggregates ingredients and categorizes them.
+    """
+    return GroceryIndex.from_meal_plan(meal_plan).as_dict()
 
+@profiled
 def parse_llm_response(response_text):
     """
     Parse the LLM's JSON response into a Python dictionary.
@@ -255,6 +676,363 @@ def parse_llm_response(response_text):
     except Exception as e:
         return None, f"Unexpected error: {str(e)}"
 
+# Plan snapshots: MAGIC + sha256 of the canonical JSON + zlib-compressed canonical JSON
+SNAPSHOT_MAGIC = b"HMP1"
+SNAPSHOT_ID_LENGTH = 16  # hex chars of the content hash used in permalinks
+MAX_SNAPSHOT_BYTES = 256 * 1024  # decompressed size limit; real plans are ~10 KB
+SNAPSHOT_PREFERENCE_KEYS = ("user_profile", "excluded_foods", "plan_duration", "meals_per_day")
+
+def snapshot_payload(meal_plan, preferences):
+    """
+    The part of a plan that a snapshot stores.
+    """
+    return {"week_plan": meal_plan["week_plan"], "preferences": preferences}
+
+def encode_plan_snapshot(meal_plan, preferences):
+    """
+    Encode a meal plan and its preferences as a compact binary snapshot.
+    Returns (snapshot_id, data); identical plans always get the same id.
+    """
+    payload = snapshot_payload(meal_plan, preferences)
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    digest = hashlib.sha256(canonical).digest()
+    data = SNAPSHOT_MAGIC + digest + zlib.compress(canonical, 9)
+    return digest.hex()[:SNAPSHOT_ID_LENGTH], data
+
+def decode_plan_snapshot(data):
+    """
+    Decode and verify a snapshot produced by encode_plan_snapshot.
+    Returns ((meal_plan, preferences), None) or (None, error message).
+    """
+    header_length = len(SNAPSHOT_MAGIC) + hashlib.sha256().digest_size
+    if len(data) <= header_length or not data.startswith(SNAPSHOT_MAGIC):
+        return None, "Not a Healthy Meals AI plan file"
+    if len(data) > MAX_SNAPSHOT_BYTES:
+        return None, "Invalid plan file: plan is too large"
+    
+    digest = data[len(SNAPSHOT_MAGIC):header_length]
+    decompressor = zlib.decompressobj()
+    try:
+        # Bounded so a small file cannot expand into a huge payload (zip bomb)
+        canonical = decompressor.decompress(data[header_length:], MAX_SNAPSHOT_BYTES)
+    except zlib.error as e:
+        return None, f"Corrupted plan file: {str(e)}"
+    if decompressor.unconsumed_tail:
+        return None, "Invalid plan file: plan is too large"
+    if not decompressor.eof or decompressor.unused_data:
+        return None, "Corrupted plan file: truncated or trailing data"
+    if hashlib.sha256(canonical).digest() != digest:
+        return None, "Corrupted plan file: content hash does not match"
+    
+    try:
+        payload = json.loads(canonical)
+    except ValueError as e:
+        return None, f"Invalid plan file: {str(e)}"
+    error = validate_plan_payload(payload)
+    if error:
+        return None, f"Invalid plan file: {error}"
+    return ({"week_plan": payload["week_plan"]}, payload["preferences"]), None
+
+def validate_plan_payload(payload):
+    """
+    Check that a snapshot payload has the shape the app relies on. Accepts the
+    same plans the app renders (meals without ingredients count as having none),
+    so anything the app saves can be opened again.
+    Returns an error message, or None if the payload is valid.
+    """
+    def is_string_list(value):
+        return isinstance(value, list) and all(isinstance(item, str) for item in value)
+    
+    if not isinstance(payload, dict):
+        return "expected a JSON object"
+    
+    preferences = payload.get("preferences")
+    if not isinstance(preferences, dict):
+        return "missing 'preferences'"
+    for key in SNAPSHOT_PREFERENCE_KEYS:
+        if not isinstance(preferences.get(key), str):
+            return f"preference '{key}' must be a string"
+    
+    week_plan = payload.get("week_plan")
+    if not isinstance(week_plan, dict) or not week_plan:
+        return "missing 'week_plan'"
+    for day, day_meals in week_plan.items():
+        if not isinstance(day_meals, dict):
+            return f"'{day}' must map meal names to meals"
+        for meal_type, meal_data in day_meals.items():
+            if not isinstance(meal_data, dict):
+                return f"{day} {meal_type} must be an object"
+            if "ingredients" in meal_data and not is_string_list(meal_data["ingredients"]):
+                return f"{day} {meal_type} ingredients must be a list of strings"
+            if "instructions" in meal_data and not is_string_list(meal_data["instructions"]):
+                return f"{day} {meal_type} instructions must be a list of strings"
+    return None
+
+def snapshot_path(snapshot_id):
+    """
+    Location of a stored snapshot, or None if the id is malformed.
+    """
+    if len(snapshot_id) != SNAPSHOT_ID_LENGTH or any(c not in "0123456789abcdef" for c in snapshot_id):
+        return None
+    return Path(os.getenv("HEALTHYMEALS_SNAPSHOT_DIR", "snapshots")) / f"{snapshot_id}.hmp"
+
+def save_plan_snapshot(snapshot_id, data):
+    """
+    Store a snapshot so its permalink can be opened by any session.
+    """
+    path = snapshot_path(snapshot_id)
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write then rename so concurrent readers never see a partial file
+        temp_path = path.with_suffix(f".{uuid.uuid4().hex[:8]}.tmp")
+        temp_path.write_bytes(data)
+        temp_path.replace(path)
+
+def load_plan_snapshot(snapshot_id):
+    """
+    Load a stored snapshot by permalink id.
+    Returns ((meal_plan, preferences), None) or (None, error message).
+    """
+    path = snapshot_path(snapshot_id)
+    if path is None or not path.exists():
+        return None, "This meal plan link is invalid or the plan is no longer stored"
+    return decode_plan_snapshot(path.read_bytes())
+
+def plan_meal_count(preferences):
+    """
+    Number of meals a plan with these preferences contains (days x meals per day).
+    """
+    num_days = 1 if "1-Day" in preferences.get('plan_duration', '3-Day Meal Plan') else 3
+    meals_per_day = preferences.get('meals_per_day', 'Breakfast, Lunch, Dinner')
+    num_meals = 3 if ("Breakfast" in meals_per_day or "🌅" in meals_per_day) else 2
+    return num_days * num_meals
+
+# Published OpenAI prices in USD per 1M tokens (input, cached input, output), used for cost tracking
+MODEL_PRICING = {
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4-turbo": (10.00, 10.00, 30.00),
+    "gpt-3.5-turbo": (0.50, 0.50, 1.50)
+}
+
+class ModelRouter:
+    """
+    Routes meal plan requests to the cheapest model that meets a latency SLO.
+    
+    Keeps a rolling window of recent calls per model (time to first token,
+    total latency, tokens per second, parse success and cost). Calls older
+    than `max_age` seconds are forgotten, so a model skipped for being slow
+    is measured again once its old calls expire. A model whose success rate
+    drops below the threshold over at least `min_calls` calls is taken out of
+    rotation; after `retry_after` seconds one request is sent to it as a
+    probe, and a successful call puts it back with a fresh window. Errors
+    that are not the model's fault (no request sent, auth, rate limits) are
+    not recorded. Shared by all sessions in the process, so access is
+    guarded by a lock.
+    """
+    
+    def __init__(self, pricing, window=20, slo_base=None, slo_per_meal=None,
+                 min_success_rate=0.8, min_calls=5, retry_after=300.0, max_age=1800.0,
+                 typical_prompt_tokens_per_meal=150, typical_completion_tokens_per_meal=250,
+                 clock=time.monotonic):
+        self.pricing = pricing
+        self.window = window
+        # Latency SLO for a plan = base seconds + seconds per meal in the plan
+        self.slo_base = slo_base if slo_base is not None else float(os.getenv("ROUTER_SLO_BASE_SECONDS", "10"))
+        self.slo_per_meal = slo_per_meal if slo_per_meal is not None else float(os.getenv("ROUTER_SLO_PER_MEAL_SECONDS", "4"))
+        self.min_success_rate = min_success_rate
+        self.min_calls = min_calls
+        self.retry_after = retry_after
+        self.max_age = max_age
+        # Used to estimate cost per meal for models that have not been measured yet
+        self.typical_prompt_tokens_per_meal = typical_prompt_tokens_per_meal
+        self.typical_completion_tokens_per_meal = typical_completion_tokens_per_meal
+        self.clock = clock
+        self._calls = {model: deque(maxlen=window) for model in pricing}
+        # model -> time it was taken out of rotation (or its last probe failed)
+        self._tripped_at = {}
+        # model -> time a probe request was handed out
+        self._probe_started_at = {}
+        self._lock = threading.RLock()
+    
+    def latency_slo(self, meal_count):
+        """
+        Latency budget in seconds for a plan with `meal_count` meals.
+        """
+        return self.slo_base + self.slo_per_meal * meal_count
+    
+    def call_cost(self, model, prompt_tokens, completion_tokens, cached_tokens=0):
+        """
+        Cost in USD of a single call. Cached prompt tokens are billed at the cached input price.
+        """
+        input_price, cached_price, output_price = self.pricing[model]
+        uncached_tokens = prompt_tokens - cached_tokens
+        return (uncached_tokens * input_price + cached_tokens * cached_price
+                + completion_tokens * output_price) / 1_000_000
+    
+    # HTTP statuses caused by the account or configuration rather than the model
+    NOT_MODEL_FAULT_STATUSES = frozenset({401, 403, 429})
+    
+    def record(self, model, stats, meal_count, success):
+        """
+        Record the outcome of one call. `stats` is the dict filled by
+        get_meal_plan_from_llm; `success` is False for API errors and parse failures.
+        Failures where no request reached the model, or that were rejected for
+        auth or rate-limit reasons, are ignored.
+        """
+        if model not in self._calls:
+            return
+        if not success and (not stats.get("request_sent")
+                            or stats.get("status_code") in self.NOT_MODEL_FAULT_STATUSES):
+            return
+        
+        latency = stats.get("latency")
+        ttft = stats.get("ttft", latency)
+        completion_tokens = stats.get("completion_tokens", 0)
+        generation_time = (latency - ttft) if latency is not None else 0
+        
+        call = {
+            "at": self.clock(),
+            "success": success,
+            "meal_count": meal_count,
+            "ttft": ttft,
+            "latency": latency,
+            "tokens_per_second": completion_tokens / generation_time if generation_time > 0 else None,
+            "prompt_tokens": stats.get("prompt_tokens", 0),
+            "cached_tokens": stats.get("cached_tokens", 0),
+            "cost": self.call_cost(model, stats.get("prompt_tokens", 0), completion_tokens,
+                                   stats.get("cached_tokens", 0)),
+        }
+        
+        with self._lock:
+            self._probe_started_at.pop(model, None)
+            if model in self._tripped_at:
+                if success:
+                    # Recovered: start over so old failures don't keep it out of rotation
+                    self._calls[model].clear()
+                    del self._tripped_at[model]
+                else:
+                    self._tripped_at[model] = self.clock()
+            
+            self._calls[model].append(call)
+            
+            if model not in self._tripped_at:
+                calls = self._recent_calls(model)
+                if (len(calls) >= self.min_calls
+                        and sum(c["success"] for c in calls) / len(calls) < self.min_success_rate):
+                    self._tripped_at[model] = self.clock()
+    
+    def _recent_calls(self, model):
+        """
+        The model's calls from the last `max_age` seconds; older ones are dropped.
+        Call with the lock held.
+        """
+        calls = self._calls[model]
+        cutoff = self.clock() - self.max_age
+        while calls and calls[0]["at"] < cutoff:
+            calls.popleft()
+        return list(calls)
+    
+    def model_stats(self, model):
+        """
+        Rolling averages for one model, or None if it has no recent calls.
+        """
+        with self._lock:
+            calls = self._recent_calls(model)
+        if not calls:
+            return None
+        
+        timed = [c for c in calls if c["success"] and c["latency"] is not None]
+        rates = [c["tokens_per_second"] for c in timed if c["tokens_per_second"]]
+        prompt_tokens = sum(c["prompt_tokens"] for c in timed)
+        
+        def mean(values):
+            return sum(values) / len(values) if values else None
+        
+        return {
+            "calls": len(calls),
+            "success_rate": sum(c["success"] for c in calls) / len(calls),
+            "ttft": mean([c["ttft"] for c in timed]),
+            "latency": mean([c["latency"] for c in timed]),
+            "tokens_per_second": mean(rates),
+            # Share of prompt tokens served from the provider's prefix cache, and TTFT with/without a hit
+            "cache_hit_rate": sum(c["cached_tokens"] for c in timed) / prompt_tokens if prompt_tokens else None,
+            "ttft_cache_hit": mean([c["ttft"] for c in timed if c["cached_tokens"]]),
+            "ttft_cache_miss": mean([c["ttft"] for c in timed if not c["cached_tokens"]]),
+            # Per-meal figures let plans of different sizes share one window
+            "generation_per_meal": mean([(c["latency"] - c["ttft"]) / c["meal_count"] for c in timed]),
+            "cost_per_meal": mean([c["cost"] / c["meal_count"] for c in timed]),
+        }
+    
+    def predicted_latency(self, model, meal_count):
+        """
+        Expected latency in seconds for a plan of `meal_count` meals, or None if unknown.
+        """
+        stats = self.model_stats(model)
+        if not stats or stats["latency"] is None:
+            return None
+        return stats["ttft"] + stats["generation_per_meal"] * meal_count
+    
+    def is_healthy(self, model):
+        """
+        False while a model is out of rotation after failing.
+        """
+        with self._lock:
+            return model not in self._tripped_at
+    
+    def expected_cost_per_meal(self, model):
+        """
+        Cost in USD per meal: measured if available, otherwise estimated from list prices.
+        """
+        stats = self.model_stats(model)
+        if stats and stats["cost_per_meal"] is not None:
+            return stats["cost_per_meal"]
+        return self.call_cost(model, self.typical_prompt_tokens_per_meal,
+                              self.typical_completion_tokens_per_meal)
+    
+    def choose_model(self, meal_count, default="gpt-4o-mini"):
+        """
+        Pick the cheapest healthy model predicted to meet the SLO for this plan size.
+        Models without latency data are assumed to meet the SLO, so they get measured
+        when they are the cheapest option. If none is predicted to meet the SLO, the
+        fastest healthy model is used. A failed model that is due a retry gets this
+        request as its probe; only one probe per model is outstanding at a time.
+        """
+        slo = self.latency_slo(meal_count)
+        
+        with self._lock:
+            now = self.clock()
+            due_probe = [
+                model for model, tripped_at in self._tripped_at.items()
+                if now - tripped_at >= self.retry_after
+                and now - self._probe_started_at.get(model, float("-inf")) >= self.retry_after
+            ]
+            if due_probe:
+                model = min(due_probe, key=self.expected_cost_per_meal)
+                self._probe_started_at[model] = now
+                return model
+            
+            healthy = [m for m in self.pricing if m not in self._tripped_at]
+            if not healthy:
+                return default
+            
+            fastest = None
+            for model in sorted(healthy, key=self.expected_cost_per_meal):
+                predicted = self.predicted_latency(model, meal_count)
+                if predicted is None or predicted <= slo:
+                    return model
+                if fastest is None or predicted < fastest[1]:
+                    fastest = (model, predicted)
+            
+            return fastest[0]
+
+@st.cache_resource
+def get_model_router():
+    """
+    Process-wide model router shared across sessions and reruns.
+    """
+    return ModelRouter(MODEL_PRICING)
+
 
 st.set_page_config(
     page_title="Healthy Meals AI",
@@ -262,12 +1040,19 @@ st.set_page_config(
     layout="wide"
 )
 
+profile_rerun_start()
+
+# Poppins web font: Google Fonts by default. Point HEALTHYMEALS_FONT_URL at a self-hosted
+# stylesheet, or set it empty to fall back to system fonts and skip the external request.
+font_url = os.getenv(
+    "HEALTHYMEALS_FONT_URL",
+    "https://fonts.googleapis.com/css2?family=Poppins:wght@300;400;500;600;700&display=swap"
+)
+font_import = f"<style>@import url('{font_url}');</style>" if font_url else ""
+
 # Custom CSS for styling and color palette
-st.markdown("""
+st.markdown(font_import + """
 <style>
-    /* Import Poppins font */
-    @import url('https://fonts.googleapis.com/css2?family=Poppins:wght@300;400;500;600;700&display=swap');
-    
     /* Apply Poppins font globally */
     .main * {
         font-family: 'Poppins', sans-serif !important;
@@ -405,6 +1190,7 @@ st.markdown("""
     }
 </style>
 """, unsafe_allow_html=True)
+profile_lap("css injection")
 
 # Initialize session state
 if 'stage' not in st.session_state:
@@ -413,16 +1199,33 @@ if 'preferences' not in st.session_state:
     st.session_state.preferences = {}
 if 'meal_plan' not in st.session_state:
     st.session_state.meal_plan = None
-if 'grocery_list' not in st.session_state:
-    st.session_state.grocery_list = None
+if 'grocery_index' not in st.session_state:
+    st.session_state.grocery_index = None
 if 'selected_model' not in st.session_state:
     st.session_state.selected_model = "gpt-4o-mini"
+if 'snapshot_id' not in st.session_state:
+    st.session_state.snapshot_id = None
 
 # Title in main area
 st.title("🥗 Healthy Meals AI")
 st.markdown("### 🌟 *Personalized meal plans for busy professionals*")
 st.markdown("---")
 
+# Restore a plan from a permalink (?plan=<id>) without calling the LLM
+permalink_id = st.query_params.get("plan")
+if permalink_id and permalink_id != st.session_state.snapshot_id:
+    snapshot, snapshot_error = load_plan_snapshot(permalink_id)
+    if snapshot_error:
+        st.warning(f"⚠️ {snapshot_error}")
+        del st.query_params["plan"]
+    else:
+        meal_plan, preferences = snapshot
+        st.session_state.meal_plan = meal_plan
+        st.session_state.preferences = preferences
+        st.session_state.grocery_index = GroceryIndex.from_meal_plan(meal_plan)
+        st.session_state.snapshot_id = permalink_id
+        st.session_state.stage = 'plan_view'
+
 # Sidebar configuration
 with st.sidebar:
     st.header("⚙️ Configuration")
@@ -430,12 +1233,7 @@ with st.sidebar:
     # Model Selection
     st.subheader("🤖 AI Model")
     
-    model_options = {
-        "gpt-4o-mini": "GPT-4o Mini - Fast & Cost-effective",
-        "gpt-4o": "GPT-4o - Balanced Performance", 
-        "gpt-4-turbo": "GPT-4 Turbo - High Quality",
-        "gpt-3.5-turbo": "GPT-3.5 Turbo - Basic & Speedy"
-    }
+    model_options = STATIC_TABLES["model_options"]
     
     # Handle case where previously selected model is no longer available
     current_model = st.session_state.selected_model
@@ -448,7 +1246,8 @@ with st.sidebar:
         options=list(model_options.keys()),
         format_func=lambda x: model_options[x],
         index=list(model_options.keys()).index(current_model),
-        help="Higher quality models provide better recipes but take longer and cost more"
+        help="Higher quality models provide better recipes but take longer and cost more. "
+             "Auto picks the cheapest model that is currently responding within the speed target."
     )
     
     # Update session state when model changes
@@ -459,6 +1258,36 @@ with st.sidebar:
     # Show confirmation of selected model
     st.success(f"✅ **Selected:** {model_options[selected_model]}")
     
+    with st.expander("📈 Model Performance", expanded=False):
+        router = get_model_router()
+        rows = []
+        for model in MODEL_PRICING:
+            stats = router.model_stats(model)
+            if stats:
+                rows.append({
+                    "Model": model,
+                    "Calls": stats["calls"],
+                    "Success": f"{stats['success_rate']:.0%}",
+                    "TTFT (s)": round(stats["ttft"], 1) if stats["ttft"] is not None else None,
+                    "Latency (s)": round(stats["latency"], 1) if stats["latency"] is not None else None,
+                    "Tokens/s": round(stats["tokens_per_second"]) if stats["tokens_per_second"] else None,
+                    "$/meal": f"{stats['cost_per_meal']:.5f}" if stats["cost_per_meal"] is not None else None,
+                    "Cached": f"{stats['cache_hit_rate']:.0%}" if stats["cache_hit_rate"] is not None else None,
+                    "TTFT hit/miss (s)": " / ".join(
+                        f"{value:.1f}" if value is not None else "-"
+                        for value in (stats["ttft_cache_hit"], stats["ttft_cache_miss"])
+                    )
+                })
+        if rows:
+            # Markdown rather than st.dataframe, which pulls in pyarrow/pandas on first use
+            header = "| " + " | ".join(rows[0]) + " |\n|" + "---|" * len(rows[0]) + "\n"
+            st.markdown(header + "".join(
+                "| " + " | ".join("-" if value is None else str(value) for value in row.values()) + " |\n"
+                for row in rows
+            ))
+        else:
+            st.caption("No requests yet - Auto will try the cheapest models first.")
+    
     st.divider()
     st.header("🎯 Your Preferences")
     
@@ -518,7 +1347,26 @@ with st.sidebar:
         }
         st.session_state.stage = 'generating'
         st.session_state.meal_plan = None  # Clear any existing plan
+        st.session_state.grocery_index = None
+        st.session_state.snapshot_id = None
+        st.query_params.pop("plan", None)
         st.rerun()
+    
+    # Hidden profiling controls: visible with ?debug=<HEALTHYMEALS_DEBUG_TOKEN> or when HEALTHYMEALS_PROFILE is set
+    if PROFILE_ENV_ENABLED or profile_toggle_unlocked():
+        st.divider()
+        if not PROFILE_ENV_ENABLED:
+            st.toggle("⏱️ Profile reruns", key="profile_reruns",
+                      help="Write a sampled profile and hotspot report for every rerun of this session")
+        profiler = st.session_state.get("rerun_profiler")
+        if profiler is not None and profiler.last_report:
+            report = profiler.last_report
+            with st.expander(f"⏱️ Last rerun: {report['total'] * 1000:.0f} ms", expanded=False):
+                for name, seconds in report["laps"] + report["functions"]:
+                    st.caption(f"{seconds * 1000:.1f} ms — {name}")
+                st.caption(f"Artifacts: {profiler.output_dir}/{report['name']}.*")
+
+profile_lap("sidebar")
 
 # Main content area based on current stage
 if st.session_state.stage == 'onboarding':
@@ -542,6 +1390,30 @@ if st.session_state.stage == 'onboarding':
         
         **👈 Start by setting your preferences in the sidebar!**
         """)
+        
+        # Reopen a previously downloaded plan instantly
+        uploaded_plan = st.file_uploader(
+            "📂 Or load a saved meal plan",
+            type=["hmp"],
+            help="Open a plan file downloaded from the meal plan view - no AI generation needed"
+        )
+        if uploaded_plan is not None:
+            snapshot, snapshot_error = decode_plan_snapshot(uploaded_plan.getvalue())
+            if snapshot_error:
+                st.error(f"❌ {snapshot_error}")
+            else:
+                meal_plan, preferences = snapshot
+                snapshot_id, _ = encode_plan_snapshot(meal_plan, preferences)
+                if snapshot_id != st.session_state.snapshot_id:
+                    # Uploaded plans open in this session only; they are not stored
+                    # server-side, so anonymous uploads cannot fill the snapshot store
+                    st.query_params.pop("plan", None)
+                    st.session_state.meal_plan = meal_plan
+                    st.session_state.preferences = preferences
+                    st.session_state.grocery_index = GroceryIndex.from_meal_plan(meal_plan)
+                    st.session_state.snapshot_id = snapshot_id
+                    st.session_state.stage = 'plan_view'
+                    st.rerun()
 
 elif st.session_state.stage == 'generating':
     # Generation phase - show spinner and generate meal plan
@@ -553,10 +1425,20 @@ elif st.session_state.stage == 'generating':
         # Generate the prompt
         prompt = construct_llm_prompt(st.session_state.preferences)
         
+        # Resolve "Auto" to a concrete model via the router
+        router = get_model_router()
+        meal_count = plan_meal_count(st.session_state.preferences)
+        model = st.session_state.selected_model
+        if model == "auto":
+            model = router.choose_model(meal_count)
+        
         # Call the LLM API with selected model
-        response_text, error = get_meal_plan_from_llm(prompt, st.session_state.selected_model)
+        call_stats = {}
+        response_text, error = get_meal_plan_from_llm(prompt, model, stats=call_stats)
         
         if error:
+            router.record(model, call_stats, meal_count, success=False)
+
             st.error("❌ **Failed to generate your meal plan**")
             
             # Provide specific help based on error type
@@ -592,6 +1474,7 @@ elif st.session_state.stage == 'generating':
         else:
             # Parse the response
             meal_plan, parse_error = parse_llm_response(response_text)
+            router.record(model, call_stats, meal_count, success=parse_error is None)
             
             if parse_error:
                 st.error("❌ **Unable to process the meal plan**")
@@ -615,6 +1498,19 @@ elif st.session_state.stage == 'generating':
             else:
                 # Success! Store and display
                 st.session_state.meal_plan = meal_plan
+                st.session_state.grocery_index = GroceryIndex.from_meal_plan(meal_plan)
+                
+                # Keep a snapshot so refreshes and shared links reload without regenerating.
+                # Plans a snapshot could not be reopened from get no permalink.
+                if validate_plan_payload(snapshot_payload(meal_plan, st.session_state.preferences)) is None:
+                    snapshot_id, snapshot_data = encode_plan_snapshot(meal_plan, st.session_state.preferences)
+                    st.session_state.snapshot_id = snapshot_id
+                    try:
+                        save_plan_snapshot(snapshot_id, snapshot_data)
+                        st.query_params["plan"] = snapshot_id
+                    except OSError:
+                        pass  # Plan still displays; it just won't have a permalink
+                
                 st.session_state.stage = 'plan_view'
                 st.rerun()
 
@@ -646,6 +1542,7 @@ elif st.session_state.stage == 'plan_view':
         }
         
         # Create columns based on number of days
+        profile_lap("plan view header")
         cols = st.columns(len(available_days))
         
         for i, day in enumerate(available_days):
@@ -675,6 +1572,7 @@ elif st.session_state.stage == 'plan_view':
                             st.write("**👩‍🍳 Instructions:**")
                             for j, instruction in enumerate(meal_data['instructions'], 1):
                                 st.write(f"{j}. {instruction}")
+        profile_lap("plan view meal expanders")
         
         st.divider()
         
@@ -685,8 +1583,9 @@ elif st.session_state.stage == 'plan_view':
         col1, col2, col3 = st.columns([1, 1, 1])
         with col1:
             if st.button("🛒 Create Grocery List", type="secondary", use_container_width=True):
-                # Generate grocery list and switch to grocery view
-                st.session_state.grocery_list = generate_grocery_list(st.session_state.meal_plan)
+                # The grocery index is kept in sync with the plan; just switch views
+                if st.session_state.grocery_index is None:
+                    st.session_state.grocery_index = GroceryIndex.from_meal_plan(st.session_state.meal_plan)
                 st.session_state.stage = 'grocery_list'
                 st.rerun()
         
@@ -694,13 +1593,31 @@ elif st.session_state.stage == 'plan_view':
             if st.button("🔄 Generate New Plan", use_container_width=True):
                 st.session_state.stage = 'generating'
                 st.session_state.meal_plan = None
-                st.session_state.grocery_list = None
+                st.session_state.grocery_index = None
+                st.session_state.snapshot_id = None
+                st.query_params.pop("plan", None)
                 st.rerun()
         
         with col3:
             if st.button("⚙️ Change Preferences", use_container_width=True):
                 st.session_state.stage = 'onboarding'
                 st.rerun()
+        
+        # Save or share the plan without regenerating it
+        st.markdown("### 💾 Save or Share")
+        if validate_plan_payload(snapshot_payload(st.session_state.meal_plan, st.session_state.preferences)) is None:
+            snapshot_id, snapshot_data = encode_plan_snapshot(st.session_state.meal_plan, st.session_state.preferences)
+            st.download_button(
+                "💾 Download Plan File",
+                data=snapshot_data,
+                file_name=f"meal-plan-{snapshot_id}.hmp",
+                mime="application/octet-stream",
+                help="Load this file from the welcome page to reopen the plan instantly"
+            )
+            if st.query_params.get("plan") == snapshot_id:
+                st.caption(f"🔗 Bookmark or share this page's link to reopen the plan (plan id `{snapshot_id}`)")
+        else:
+            st.caption("This plan has an unexpected format and can't be saved or shared.")
     
     else:
         st.error("No meal plan data available. Please generate a new plan.")
@@ -715,7 +1632,9 @@ elif st.session_state.stage == 'grocery_list':
     
     st.markdown(f"## 🛒 Your {duration_text} Grocery List")
     
-    if st.session_state.grocery_list:
+    if st.session_state.grocery_index and st.session_state.grocery_index.total_items():
+        grocery_list = st.session_state.grocery_index.as_dict()
+        
         # Display meal plan info
         with st.expander("📋 Based on Your Meal Plan", expanded=False):
             st.write("**Profile:**", st.session_state.preferences.get('user_profile'))
@@ -728,7 +1647,7 @@ elif st.session_state.stage == 'grocery_list':
         st.markdown("### 🥗 Organized by Store Section")
         
         # Create columns for categories (max 3 columns for readability)
-        categories = list(st.session_state.grocery_list.keys())
+        categories = list(grocery_list.keys())
         
         if len(categories) <= 3:
             cols = st.columns(len(categories))
@@ -736,21 +1655,11 @@ elif st.session_state.stage == 'grocery_list':
             # Split into multiple rows if more than 3 categories
             cols = st.columns(3)
         
-        for i, (category, items) in enumerate(st.session_state.grocery_list.items()):
+        for i, (category, items) in enumerate(grocery_list.items()):
             col_index = i % 3 if len(categories) > 3 else i
             
             with cols[col_index]:
-                # Category emoji mapping
-                category_emoji = {
-                    "Produce": "🥬",
-                    "Proteins": "🥩", 
-                    "Dairy": "🥛",
-                    "Grains & Pantry": "🌾",
-                    "Frozen": "🧊",
-                    "Other": "📦"
-                }
-                
-                emoji = category_emoji.get(category, "📦")
+                emoji = STATIC_TABLES["category_emoji"].get(category, "📦")
                 st.subheader(f"{emoji} {category}")
                 
                 # Display items as checkboxes for easy shopping
@@ -761,9 +1670,11 @@ elif st.session_state.stage == 'grocery_list':
                 if len(categories) > 3 and (i + 1) % 3 == 0 and i < len(categories) - 1:
                     st.markdown("---")
         
+        profile_lap("grocery list categories")
+        
         # Summary stats
         st.divider()
-        total_items = sum(len(items) for items in st.session_state.grocery_list.values())
+        total_items = sum(len(items) for items in grocery_list.values())
         st.info(f"📊 **Total Items:** {total_items} across {len(categories)} categories")
         
         # Action buttons with improved styling
@@ -778,8 +1689,8 @@ elif st.session_state.stage == 'grocery_list':
         
         with col2:
             if st.button("🔄 Regenerate List", use_container_width=True):
-                # Regenerate grocery list from current meal plan
-                st.session_state.grocery_list = generate_grocery_list(st.session_state.meal_plan)
+                # Rebuild the grocery index from scratch from the current meal plan
+                st.session_state.grocery_index = GroceryIndex.from_meal_plan(st.session_state.meal_plan)
                 st.rerun()
         
         with col3:
@@ -793,3 +1704,4 @@ elif st.session_state.stage == 'grocery_list':
             st.session_state.stage = 'plan_view'
             st.rerun()
 
+profile_rerun_end()
@@ -0,0 +1,451 @@
+"""
+Concurrent-session load test for the Healthy Meals AI Streamlit app.
+
+Drives simulated user sessions through onboarding, generating, plan_view and
+grocery_list using Streamlit's AppTest harness, against a local mock of the
+OpenAI chat completions endpoint with configurable latency. The mock runs in
+a child process so it does not skew the measured CPU and RSS. For each
+concurrency level it reports per-stage p50/p95/p99 latency, session
+throughput, process RSS and CPU usage.
+
+Usage:
+    uv run python loadtest.py --concurrency 1,2,4,8,16 --sessions 32 --latency 2.0
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+APP_PATH = Path(__file__).resolve().parent / "app.py"
+
+STAGES = ["onboarding", "generating", "grocery_list", "plan_view"]
+
+# Ingredient pool for mock recipes, spread across grocery categories
+MOCK_INGREDIENTS = [
+    "2 cups of spinach", "1 red bell pepper", "3 cloves of garlic", "1 avocado",
+    "200g chicken breast", "150g salmon fillet", "1 cup of quinoa", "2 eggs",
+    "1 cup of greek yogurt", "50g feta", "1 tablespoon of olive oil",
+    "1 cup of brown rice", "1 cup of vegetable broth", "1 cup of frozen berries",
+    "1 can of chickpeas", "1 zucchini", "1 lemon", "fresh basil", "1 sweet potato",
+    "2 tablespoons of tahini", "1 cup of lentils", "1 teaspoon of cumin",
+]
+
+
+def build_mock_meal_plan(prompt):
+    """
+    Build a meal plan JSON string shaped like the one the prompt asks for.
+    """
+    if '"tuesday"' in prompt:
+        days = ["monday", "tuesday", "wednesday"]
+    else:
+        days = ["monday"]
+    if '"breakfast"' in prompt:
+        meals = ["breakfast", "lunch", "dinner"]
+    else:
+        meals = ["lunch", "dinner"]
+
+    rng = random.Random(hash(prompt))
+    week_plan = {}
+    for day in days:
+        week_plan[day] = {}
+        for meal in meals:
+            week_plan[day][meal] = {
+                "name": f"Mock {meal.title()} for {day.title()}",
+                "prep_time": f"{rng.randint(10, 45)} minutes",
+                "ingredients": rng.sample(MOCK_INGREDIENTS, 6),
+                "instructions": [f"Step {i}: prepare and cook." for i in range(1, 5)],
+                "calories": rng.randint(300, 700),
+                "protein": f"{rng.randint(15, 45)}g",
+            }
+    return json.dumps({"week_plan": week_plan})
+
+
+class MockLLMServer:
+    """
+    Minimal OpenAI-compatible chat completions server with artificial latency.
+    Runs in a background thread; every request takes latency +/- jitter seconds.
+    Streaming requests send their first token after `ttft_fraction` of that time.
+    """
+
+    def __init__(self, latency=1.0, jitter=0.0, ttft_fraction=0.25):
+        self.latency = latency
+        self.jitter = jitter
+        self.ttft_fraction = ttft_fraction
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                prompt = payload.get("messages", [{}])[-1].get("content", "")
+
+                delay = max(0.0, server.latency + random.uniform(-server.jitter, server.jitter))
+                content = build_mock_meal_plan(prompt)
+                usage = {
+                    "prompt_tokens": len(prompt) // 4,
+                    "completion_tokens": len(content) // 4,
+                    "total_tokens": (len(prompt) + len(content)) // 4,
+                }
+
+                if payload.get("stream"):
+                    self.stream_response(content, usage, delay)
+                    return
+
+                time.sleep(delay)
+                body = json.dumps({
+                    "model": payload.get("model", "mock"),
+                    "choices": [{"message": {"role": "assistant", "content": content}}],
+                    "usage": usage,
+                }).encode()
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def stream_response(self, content, usage, delay):
+                # First token after ttft_fraction of the delay, the rest spread over the remainder
+                chunk_count = 10
+                chunk_size = -(-len(content) // chunk_count)
+                first_token_delay = delay * server.ttft_fraction
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+
+                time.sleep(first_token_delay)
+                for i in range(0, len(content), chunk_size):
+                    chunk = {"choices": [{"index": 0, "delta": {"content": content[i:i + chunk_size]}}]}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    time.sleep((delay - first_token_delay) / chunk_count)
+                final = {"choices": [], "usage": usage}
+                self.wfile.write(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode())
+
+            def log_message(self, format, *args):
+                pass  # Keep load test output readable
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}/v1"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class MockLLMProcess:
+    """
+    Runs MockLLMServer in a child process, so its CPU, memory and threads are
+    not counted against (or competing for the GIL with) the measured sessions.
+    """
+
+    def __init__(self, latency=1.0, jitter=0.0, ttft_fraction=0.25):
+        self.args = [sys.executable, str(Path(__file__).resolve()), "--serve-mock",
+                     "--latency", str(latency), "--jitter", str(jitter),
+                     "--ttft-fraction", str(ttft_fraction)]
+        self.process = None
+        self.base_url = None
+
+    def __enter__(self):
+        self.process = subprocess.Popen(self.args, stdout=subprocess.PIPE, text=True)
+        # The child prints its base URL once it is listening
+        self.base_url = self.process.stdout.readline().strip()
+        if not self.base_url:
+            self.process.kill()
+            raise RuntimeError("Mock LLM server failed to start")
+        return self
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        self.process.wait(timeout=10)
+
+
+def serve_mock(latency, jitter, ttft_fraction):
+    """
+    Child-process entry point for MockLLMProcess: serve until terminated.
+    """
+    with MockLLMServer(latency=latency, jitter=jitter, ttft_fraction=ttft_fraction) as server:
+        print(server.base_url, flush=True)
+        server.thread.join()
+
+
+def install_shared_runtime():
+    """
+    Make AppTest safe to run from several threads at once.
+
+    AppTest installs a mock Runtime singleton at the start of every script run
+    and clears it at the end, so concurrent runs tear the runtime out from under
+    each other. Install one shared mock runtime up front and point AppTest at a
+    subclass, so its per-run set/reset only touches the subclass attribute.
+
+    This relies on Streamlit internals (checked against Streamlit 1.48.0 and
+    1.66.0). Returns False, leaving Streamlit untouched, if those internals have moved.
+    """
+    from unittest.mock import MagicMock
+
+    try:
+        from streamlit.runtime import Runtime
+        from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+        from streamlit.runtime.media_file_manager import MediaFileManager
+        from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+        from streamlit.testing.v1 import app_test
+    except ImportError:
+        return False
+    if not hasattr(Runtime, "_instance") or getattr(app_test, "Runtime", None) is not Runtime:
+        return False
+
+    shared_runtime = MagicMock(spec=Runtime)
+    shared_runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    try:
+        # Newer Streamlit versions also give the mock runtime a dataframe source manager
+        from streamlit.runtime.dataframe_source_manager import DataframeSourceManager
+        shared_runtime.dataframe_source_mgr = DataframeSourceManager()
+    except ImportError:
+        pass
+    shared_runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime._instance = shared_runtime
+
+    app_test.Runtime = type("Runtime", (Runtime,), {})
+    return True
+
+
+def find_button(at, label):
+    """
+    Return the first button (main area or sidebar) whose label contains `label`.
+    """
+    for button in list(at.button) + list(at.sidebar.button):
+        if label in button.label:
+            return button
+    raise LookupError(f"Button not found: {label!r} (stage={at.session_state['stage']})")
+
+
+def run_session(session_id, timeout, model=None):
+    """
+    Drive one simulated user through the app.
+    Returns a dict of stage -> seconds, or raises on failure.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    timings = {}
+    rng = random.Random(session_id)
+    at = AppTest.from_file(str(APP_PATH), default_timeout=timeout)
+
+    start = time.perf_counter()
+    at.run()
+    timings["onboarding"] = time.perf_counter() - start
+
+    if model:
+        at.sidebar.selectbox[0].select(model).run()
+
+    # Vary preferences so sessions do not all request the same plan shape
+    at.sidebar.radio[0].set_value(rng.choice(at.sidebar.radio[0].options))
+    at.sidebar.radio[1].set_value(rng.choice(at.sidebar.radio[1].options))
+    at.sidebar.radio[2].set_value(rng.choice(at.sidebar.radio[2].options))
+
+    start = time.perf_counter()
+    find_button(at, "Generate My Meal Plan").click().run()
+    timings["generating"] = time.perf_counter() - start
+    if at.session_state["stage"] != "plan_view":
+        raise RuntimeError(f"generation did not reach plan_view: {[e.value for e in at.error]}")
+
+    start = time.perf_counter()
+    find_button(at, "Create Grocery List").click().run()
+    timings["grocery_list"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    find_button(at, "Back to Meal Plan").click().run()
+    timings["plan_view"] = time.perf_counter() - start
+
+    return timings
+
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of a list of numbers.
+    """
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    rank = max(1, round(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def current_rss_mb():
+    """
+    Resident set size of this process in MB (psutil if available, else peak RSS).
+    """
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is bytes on macOS, kilobytes on Linux
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_level(concurrency, sessions, timeout, model=None):
+    """
+    Run `sessions` simulated sessions with at most `concurrency` in flight.
+    """
+    stage_times = {stage: [] for stage in STAGES}
+    errors = []
+
+    cpu_start = os.times()
+    wall_start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(run_session, i, timeout, model) for i in range(sessions)]
+        for future in futures:
+            try:
+                timings = future.result()
+            except Exception as e:
+                errors.append(str(e))
+                continue
+            for stage, seconds in timings.items():
+                stage_times[stage].append(seconds)
+
+    wall = time.perf_counter() - wall_start
+    cpu_end = os.times()
+    cpu_seconds = (cpu_end.user - cpu_start.user) + (cpu_end.system - cpu_start.system)
+
+    return {
+        "concurrency": concurrency,
+        "sessions": sessions,
+        "completed": sessions - len(errors),
+        "errors": errors,
+        "wall_seconds": wall,
+        "throughput": (sessions - len(errors)) / wall if wall else 0.0,
+        "cpu_percent": 100 * cpu_seconds / wall if wall else 0.0,
+        "rss_mb": current_rss_mb(),
+        "stages": {
+            stage: {
+                "p50": percentile(times, 50),
+                "p95": percentile(times, 95),
+                "p99": percentile(times, 99),
+            }
+            for stage, times in stage_times.items()
+        },
+    }
+
+
+def print_report(results, latency):
+    """
+    Print a per-level summary and flag the saturation point.
+    """
+    print(f"\nMock LLM latency: {latency:.2f}s\n")
+    header = f"{'conc':>5} {'done':>6} {'sess/s':>8} {'cpu%':>7} {'rss MB':>8}"
+    for stage in STAGES:
+        header += f"  {stage + ' p50/p95/p99 (s)':>34}"
+    print(header)
+    print("-" * len(header))
+
+    for r in results:
+        line = (f"{r['concurrency']:>5} {r['completed']:>3}/{r['sessions']:<2} "
+                f"{r['throughput']:>8.2f} {r['cpu_percent']:>7.1f} {r['rss_mb']:>8.1f}")
+        for stage in STAGES:
+            s = r["stages"][stage]
+            line += f"  {s['p50']:>10.3f} {s['p95']:>10.3f} {s['p99']:>10.3f}  "
+        print(line)
+        for error in r["errors"][:3]:
+            print(f"      ! {error}")
+
+    if not results:
+        return
+    peak = max(results, key=lambda r: r["throughput"])
+
+    # Saturation: first level that adds less than 10% over the best level before it
+    best_so_far = None
+    for r in results:
+        if best_so_far and r["throughput"] < best_so_far["throughput"] * 1.1:
+            print(f"\nThroughput stopped scaling at concurrency {r['concurrency']} "
+                  f"(peak {peak['throughput']:.2f} sessions/s at concurrency {peak['concurrency']}).")
+            break
+        if best_so_far is None or r["throughput"] > best_so_far["throughput"]:
+            best_so_far = r
+    else:
+        print(f"\nNo saturation observed; peak {peak['throughput']:.2f} sessions/s "
+              f"at concurrency {peak['concurrency']}.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the Healthy Meals AI app with a mock LLM")
+    parser.add_argument("--concurrency", default="1,2,4,8",
+                        help="Comma-separated concurrency levels to step through (default: 1,2,4,8)")
+    parser.add_argument("--sessions", type=int, default=0,
+                        help="Sessions per level (default: 2x concurrency)")
+    parser.add_argument("--latency", type=float, default=1.0,
+                        help="Mock LLM response latency in seconds (default: 1.0)")
+    parser.add_argument("--jitter", type=float, default=0.0,
+                        help="Uniform +/- jitter added to the mock latency in seconds")
+    parser.add_argument("--ttft-fraction", type=float, default=0.25,
+                        help="Fraction of the latency spent before the first streamed token (default: 0.25)")
+    parser.add_argument("--model", default=None,
+                        help="Model to select in the sidebar, e.g. auto (default: the app default)")
+    parser.add_argument("--timeout", type=float, default=120.0,
+                        help="Per-script-run timeout in seconds (default: 120)")
+    parser.add_argument("--json", metavar="PATH", help="Also write raw results to a JSON file")
+    parser.add_argument("--serve-mock", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve_mock:
+        serve_mock(args.latency, args.jitter, args.ttft_fraction)
+        return
+
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+
+    # AppTest threads run without a browser session; silence the per-thread warnings
+    from streamlit.logger import set_log_level
+    set_log_level("error")
+    if not install_shared_runtime() and max(levels, default=1) > 1:
+        sys.exit("This Streamlit version's AppTest internals are not supported for concurrent "
+                 "sessions; run with --concurrency 1 or use a Streamlit version this script was checked against (1.48.0, 1.66.0).")
+
+    # Keep plan snapshots written by the app out of the working directory
+    snapshot_dir = tempfile.mkdtemp(prefix="healthymeals-loadtest-")
+
+    try:
+        with MockLLMProcess(latency=args.latency, jitter=args.jitter,
+                            ttft_fraction=args.ttft_fraction) as server:
+            # Route the app's OpenAI calls to the mock
+            os.environ["LLM_PROVIDER"] = "openai"
+            os.environ["OPENAI_BASE_URL"] = server.base_url
+            os.environ["OPENAI_API_KEY"] = "sk-loadtest"
+            os.environ["HEALTHYMEALS_SNAPSHOT_DIR"] = snapshot_dir
+
+            results = []
+            for level in levels:
+                sessions = args.sessions or level * 2
+                print(f"Running {sessions} sessions at concurrency {level}...", flush=True)
+                results.append(run_level(level, sessions, args.timeout, args.model))
+    finally:
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
+
+    print_report(results, args.latency)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"latency": args.latency, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Cold-start report for the Healthy Meals AI Streamlit app.
+
+Starts a fresh Python process with `-X importtime`, imports Streamlit and
+renders app.py once through Streamlit's AppTest harness, then a second time
+to compare against a warm rerun. Reports import time per top-level package
+(split into imports before the first render and imports triggered by it)
+and first-render time per module. The per-module table comes from sampling
+stacks that run inside app.py, so the AppTest harness's own work (source
+parsing, message replay) is reported separately instead of drowning out the
+app's hotspots.
+
+Usage:
+    uv run python startup_report.py
+    uv run python startup_report.py --top 25
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import sysconfig
+import threading
+import time
+from pathlib import Path
+
+APP_PATH = Path(__file__).resolve().parent / "app.py"
+
+# Written to stderr by the child so the importtime log can be split by phase
+RENDER_MARKER = "startup-report: first render"
+SAMPLE_INTERVAL = 0.001  # seconds between stack samples during the first render
+
+
+def module_group(filename):
+    """
+    Group a code object's filename under a readable module name.
+    """
+    if filename == str(APP_PATH):
+        return "app.py"
+    if filename.startswith("<") or filename == "~":
+        return "builtins/frozen"
+
+    path = Path(filename)
+    for root in {sysconfig.get_paths()["purelib"], sysconfig.get_paths()["platlib"]}:
+        if filename.startswith(root):
+            return path.relative_to(root).parts[0].removesuffix(".py")
+    stdlib = sysconfig.get_paths()["stdlib"]
+    if filename.startswith(stdlib):
+        return "stdlib:" + path.relative_to(stdlib).parts[0].removesuffix(".py")
+    return path.name
+
+
+def sample_app_frames(stop, render_by_module):
+    """
+    Until `stop` is set, sample every thread's stack and, for stacks that are
+    running app.py, add the time since the previous sample to the module of the
+    innermost frame. Stacks outside app.py belong to the harness and are skipped.
+    """
+    app_file = str(APP_PATH)
+    me = threading.get_ident()
+    last = time.perf_counter()
+    while not stop.wait(SAMPLE_INTERVAL):
+        now = time.perf_counter()
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == me:
+                continue
+            leaf, in_app = frame, False
+            while frame is not None:
+                if frame.f_code.co_filename == app_file:
+                    in_app = True
+                    break
+                frame = frame.f_back
+            if in_app:
+                group = module_group(leaf.f_code.co_filename)
+                render_by_module[group] = render_by_module.get(group, 0.0) + (now - last)
+        last = now
+
+
+def run_child():
+    """
+    Measure imports and the first two renders in this (fresh) process.
+    Prints a JSON summary to stdout.
+    """
+    start = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    import_seconds = time.perf_counter() - start
+
+    at = AppTest.from_file(str(APP_PATH), default_timeout=60)
+
+    print(RENDER_MARKER, file=sys.stderr, flush=True)
+    render_by_module = {}
+    stop = threading.Event()
+    sampler = threading.Thread(target=sample_app_frames, args=(stop, render_by_module), daemon=True)
+    start = time.perf_counter()
+    sampler.start()
+    at.run()
+    stop.set()
+    sampler.join()
+    first_render_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    at.run()
+    second_render_seconds = time.perf_counter() - start
+
+    print(json.dumps({
+        "import_seconds": import_seconds,
+        "first_render_seconds": first_render_seconds,
+        "second_render_seconds": second_render_seconds,
+        "render_by_module": render_by_module,
+        "exceptions": [str(e.value) for e in at.exception],
+    }))
+
+
+def parse_importtime(stderr):
+    """
+    Sum `-X importtime` self times per top-level package, split at the render marker.
+    Returns (before_render, during_render) dicts of package -> seconds.
+    """
+    before, during = {}, {}
+    current = before
+    for line in stderr.splitlines():
+        if line.startswith(RENDER_MARKER):
+            current = during
+            continue
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        package = name.strip().split(".")[0]
+        current[package] = current.get(package, 0.0) + int(self_us) / 1_000_000
+    return before, during
+
+
+def print_table(title, totals, top):
+    """
+    Print the `top` largest entries of a name -> seconds dict.
+    """
+    print(f"\n{title} (total {sum(totals.values()) * 1000:.0f} ms)")
+    for name, seconds in sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]:
+        print(f"  {seconds * 1000:9.1f} ms  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report import and first-render cost of app.py")
+    parser.add_argument("--top", type=int, default=15, help="Rows per table (default: 15)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child()
+        return
+
+    env = dict(os.environ)
+    env.pop("HEALTHYMEALS_PROFILE", None)  # Keep the app's own profiler out of the measurement
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", __file__, "--child"],
+        capture_output=True, text=True, env=env
+    )
+    process_seconds = time.perf_counter() - start
+    if result.returncode != 0:
+        sys.exit(f"Child process failed:\n{result.stderr[-2000:]}")
+
+    summary = json.loads(result.stdout.strip().splitlines()[-1])
+    before, during = parse_importtime(result.stderr)
+
+    print(f"Process start to exit:  {process_seconds * 1000:8.0f} ms")
+    print(f"Import streamlit:       {summary['import_seconds'] * 1000:8.0f} ms")
+    print(f"First render (cold):    {summary['first_render_seconds'] * 1000:8.0f} ms")
+    print(f"Second render (warm):   {summary['second_render_seconds'] * 1000:8.0f} ms")
+    for exception in summary["exceptions"]:
+        print(f"  ! app raised: {exception}")
+
+    print_table("Imports before first render, by package", before, args.top)
+    print_table("Imports triggered by the first render, by package", during, args.top)
+    app_seconds = sum(summary["render_by_module"].values())
+    print_table("First render time inside app.py, by module (sampled)", summary["render_by_module"], args.top)
+    print(f"  {(summary['first_render_seconds'] - app_seconds) * 1000:9.1f} ms  "
+          "outside app.py: AppTest harness, script compilation and Streamlit runtime (not shown above)")
+
+
+if __name__ == "__main__":
+    main()
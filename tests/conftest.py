@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+# app.py lives at the repository root and is imported as a module by the tests.
+# Importing it runs the Streamlit script in "bare mode", which renders nothing.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
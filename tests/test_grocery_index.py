@@ -0,0 +1,79 @@
+import copy
+import random
+
+import pytest
+
+from app import GroceryIndex, generate_grocery_list
+
+INGREDIENTS = [
+    "Spinach", "spinach", "2 cups of spinach", "1 red bell pepper", "3 cloves of garlic",
+    "Garlic", "200g chicken breast", "1 cup of quinoa", "Quinoa", "2 eggs", "1 cup of greek yogurt",
+    "50g feta", "1 tablespoon of olive oil", "Olive oil", "1 cup of frozen berries", "1 lemon",
+    "fresh basil", "1 teaspoon of cumin", "mystery spice", "",
+]
+
+
+def random_meal(rng):
+    return {"name": "Meal", "ingredients": rng.sample(INGREDIENTS, rng.randint(0, 6))}
+
+
+def random_plan(rng):
+    days = ["monday", "tuesday", "wednesday"][:rng.choice([1, 3])]
+    meals = rng.choice([["breakfast", "lunch", "dinner"], ["lunch", "dinner"]])
+    return {"week_plan": {day: {meal: random_meal(rng) for meal in meals} for day in days}}
+
+
+def test_generate_grocery_list_categorizes_and_dedupes():
+    plan = {"week_plan": {"monday": {
+        "lunch": {"ingredients": ["2 cups of spinach", "200g chicken breast", "1 cup of ice"]},
+        "dinner": {"ingredients": ["2 Cups of Spinach", "mystery herb"]},
+    }}}
+
+    assert generate_grocery_list(plan) == {
+        "Produce": ["2 cups of spinach"],
+        "Proteins": ["200g chicken breast"],
+        "Frozen": ["1 cup of ice"],
+        "Other": ["mystery herb"],
+    }
+
+
+def test_swapping_in_the_same_meal_keeps_the_plan_order_spelling():
+    plan = {"week_plan": {"monday": {
+        "lunch": {"ingredients": ["Spinach"]},
+        "dinner": {"ingredients": ["spinach"]},
+    }}}
+    index = GroceryIndex.from_meal_plan(plan)
+
+    index.replace_meal("monday", "lunch", {"ingredients": ["Spinach"]})
+
+    assert index.as_dict() == {"Produce": ["Spinach"]}
+
+
+def test_removing_a_meal_drops_ingredients_only_it_used():
+    plan = {"week_plan": {"monday": {
+        "lunch": {"ingredients": ["1 lemon", "Quinoa"]},
+        "dinner": {"ingredients": ["1 cup of quinoa"]},
+    }}}
+    index = GroceryIndex.from_meal_plan(plan)
+
+    index.remove_meal("monday", "lunch")
+
+    assert index.as_dict() == {"Proteins": ["1 cup of quinoa"]}
+    assert index.total_items() == 1
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_incremental_edits_match_a_rebuild(seed):
+    rng = random.Random(seed)
+    plan = random_plan(rng)
+    index = GroceryIndex.from_meal_plan(plan)
+
+    for _ in range(5):
+        plan = copy.deepcopy(plan)
+        day = rng.choice(list(plan["week_plan"]))
+        meal = rng.choice(list(plan["week_plan"][day]))
+        new_meal = random_meal(rng)
+        plan["week_plan"][day][meal] = new_meal
+        index.replace_meal(day, meal, new_meal)
+
+        assert index.as_dict() == GroceryIndex.from_meal_plan(plan).as_dict()
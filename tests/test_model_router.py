@@ -0,0 +1,154 @@
+import pytest
+
+from app import MODEL_PRICING, ModelRouter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def call_stats(latency=5.0, ttft=1.0, prompt_tokens=1000, completion_tokens=2000):
+    return {"request_sent": True, "latency": latency, "ttft": ttft, "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens, "cached_tokens": 0}
+
+
+def take_out_of_rotation(router, model):
+    for _ in range(router.min_calls):
+        router.record(model, call_stats(), meal_count=6, success=False)
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def router(clock):
+    return ModelRouter(MODEL_PRICING, slo_base=10, slo_per_meal=4, retry_after=300, clock=clock)
+
+
+def test_unmeasured_models_start_with_the_cheapest(router):
+    assert router.choose_model(9) == "gpt-4o-mini"
+
+
+def test_measured_expensive_model_does_not_outrank_cheaper_unmeasured_model(router):
+    router.record("gpt-4-turbo", call_stats(latency=20.0), meal_count=9, success=True)
+
+    assert router.choose_model(9) == "gpt-4o-mini"
+
+
+def test_estimated_and_measured_costs_share_units(router):
+    router.record("gpt-4o-mini", call_stats(), meal_count=6, success=True)
+
+    measured = router.expected_cost_per_meal("gpt-4o-mini")
+    estimated = router.expected_cost_per_meal("gpt-4-turbo")
+
+    assert measured < estimated < 1
+
+
+def test_model_missing_the_slo_is_skipped(router):
+    router.record("gpt-4o-mini", call_stats(latency=80.0, ttft=2.0), meal_count=9, success=True)
+    router.record("gpt-3.5-turbo", call_stats(latency=12.0, ttft=1.0), meal_count=9, success=True)
+
+    assert router.choose_model(9) == "gpt-3.5-turbo"
+
+
+def test_fastest_model_is_used_when_none_meets_the_slo(router):
+    for model, latency in [("gpt-4o-mini", 90.0), ("gpt-3.5-turbo", 70.0),
+                           ("gpt-4o", 100.0), ("gpt-4-turbo", 120.0)]:
+        router.record(model, call_stats(latency=latency, ttft=2.0), meal_count=9, success=True)
+
+    assert router.choose_model(9) == "gpt-3.5-turbo"
+
+
+def test_failing_model_leaves_rotation(router):
+    take_out_of_rotation(router, "gpt-4o-mini")
+
+    assert not router.is_healthy("gpt-4o-mini")
+    assert router.choose_model(6) == "gpt-3.5-turbo"
+
+
+def test_a_single_failure_does_not_take_a_model_out(router):
+    router.record("gpt-4o-mini", call_stats(), meal_count=6, success=False)
+
+    assert router.is_healthy("gpt-4o-mini")
+    assert router.choose_model(6) == "gpt-4o-mini"
+
+
+@pytest.mark.parametrize("stats", [
+    {},  # e.g. missing API key: no request was sent
+    {"request_sent": True, "status_code": 401},
+    {"request_sent": True, "status_code": 429},
+])
+def test_errors_that_are_not_the_models_fault_are_ignored(router, stats):
+    for _ in range(router.min_calls):
+        router.record("gpt-4o-mini", stats, meal_count=6, success=False)
+
+    assert router.is_healthy("gpt-4o-mini")
+    assert router.model_stats("gpt-4o-mini") is None
+
+
+def test_slow_model_is_measured_again_once_its_calls_expire(router, clock):
+    router.record("gpt-4o-mini", call_stats(latency=200.0), meal_count=6, success=True)
+    assert router.choose_model(6) == "gpt-3.5-turbo"
+
+    clock.now += router.max_age + 1
+
+    assert router.choose_model(6) == "gpt-4o-mini"
+
+
+def test_only_one_probe_is_handed_out_after_the_cool_down(router, clock):
+    take_out_of_rotation(router, "gpt-4o-mini")
+    clock.now += 301
+
+    assert router.choose_model(6) == "gpt-4o-mini"
+    assert router.choose_model(6) == "gpt-3.5-turbo"
+    assert router.choose_model(6) == "gpt-3.5-turbo"
+
+
+def test_successful_probe_restores_the_model(router, clock):
+    for _ in range(4):
+        router.record("gpt-4o-mini", call_stats(), meal_count=6, success=True)
+    router.record("gpt-4o-mini", call_stats(), meal_count=6, success=False)
+    router.record("gpt-4o-mini", call_stats(), meal_count=6, success=False)
+    assert not router.is_healthy("gpt-4o-mini")
+
+    clock.now += 301
+    assert router.choose_model(6) == "gpt-4o-mini"
+    router.record("gpt-4o-mini", call_stats(), meal_count=6, success=True)
+
+    assert router.is_healthy("gpt-4o-mini")
+    assert router.model_stats("gpt-4o-mini")["success_rate"] == 1.0
+    assert router.choose_model(6) == "gpt-4o-mini"
+
+
+def test_failed_probe_restarts_the_cool_down(router, clock):
+    take_out_of_rotation(router, "gpt-4o-mini")
+    clock.now += 301
+    assert router.choose_model(6) == "gpt-4o-mini"
+    router.record("gpt-4o-mini", call_stats(), meal_count=6, success=False)
+
+    clock.now += 100
+    assert router.choose_model(6) == "gpt-3.5-turbo"
+    clock.now += 201
+    assert router.choose_model(6) == "gpt-4o-mini"
+
+
+def test_abandoned_probe_can_be_reissued(router, clock):
+    take_out_of_rotation(router, "gpt-4o-mini")
+    clock.now += 301
+    assert router.choose_model(6) == "gpt-4o-mini"
+
+    clock.now += 301
+    assert router.choose_model(6) == "gpt-4o-mini"
+
+
+def test_cached_tokens_are_billed_at_the_cached_price(router):
+    full = router.call_cost("gpt-4o", 2000, 0)
+    half_cached = router.call_cost("gpt-4o", 2000, 0, cached_tokens=1000)
+
+    assert half_cached == pytest.approx(full * 0.75)
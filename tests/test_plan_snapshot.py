@@ -0,0 +1,95 @@
+import hashlib
+import json
+import zlib
+
+import pytest
+
+from app import (MAX_SNAPSHOT_BYTES, SNAPSHOT_MAGIC, decode_plan_snapshot,
+                 encode_plan_snapshot, parse_llm_response)
+
+PREFERENCES = {
+    "user_profile": "🥗 Vegetarian",
+    "excluded_foods": "mushrooms",
+    "plan_duration": "1-Day Meal Plan",
+    "meals_per_day": "Lunch, Dinner",
+}
+MEAL_PLAN = {"week_plan": {"monday": {
+    "lunch": {"name": "Salad", "ingredients": ["Spinach", "1 lemon"], "instructions": ["Toss"]},
+    "dinner": {"name": "Soup", "ingredients": ["2 carrots"]},
+}}}
+
+
+def raw_snapshot(payload):
+    """Encode any payload the way encode_plan_snapshot does, without its checks."""
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return SNAPSHOT_MAGIC + hashlib.sha256(canonical).digest() + zlib.compress(canonical, 9)
+
+
+def test_round_trip_restores_plan_and_preferences():
+    snapshot_id, data = encode_plan_snapshot(MEAL_PLAN, PREFERENCES)
+
+    assert decode_plan_snapshot(data) == ((MEAL_PLAN, PREFERENCES), None)
+    assert encode_plan_snapshot(MEAL_PLAN, dict(PREFERENCES))[0] == snapshot_id
+
+
+def test_any_plan_the_app_accepts_can_be_reopened():
+    response = json.dumps({"week_plan": {"monday": {
+        "lunch": {"name": "Salad", "ingredients": ["Spinach"]},
+        "dinner": {"name": "Leftovers"},
+    }}})
+    meal_plan, error = parse_llm_response(response)
+    assert error is None
+
+    _, data = encode_plan_snapshot(meal_plan, PREFERENCES)
+
+    assert decode_plan_snapshot(data) == ((meal_plan, PREFERENCES), None)
+
+
+def test_rejects_tampered_content():
+    _, data = encode_plan_snapshot(MEAL_PLAN, PREFERENCES)
+    tampered = data[:len(SNAPSHOT_MAGIC)] + bytes(32) + data[len(SNAPSHOT_MAGIC) + 32:]
+
+    snapshot, error = decode_plan_snapshot(tampered)
+
+    assert snapshot is None
+    assert "hash does not match" in error
+
+
+def test_rejects_payload_that_decompresses_past_the_limit():
+    bomb = SNAPSHOT_MAGIC + bytes(32) + zlib.compress(b" " * (MAX_SNAPSHOT_BYTES * 40), 9)
+    assert len(bomb) < MAX_SNAPSHOT_BYTES
+
+    snapshot, error = decode_plan_snapshot(bomb)
+
+    assert snapshot is None
+    assert "too large" in error
+
+
+def test_rejects_truncated_stream():
+    _, data = encode_plan_snapshot(MEAL_PLAN, PREFERENCES)
+
+    snapshot, error = decode_plan_snapshot(data[:-5])
+
+    assert snapshot is None
+    assert "truncated" in error
+
+
+@pytest.mark.parametrize("payload", [
+    ["not", "an", "object"],
+    {"week_plan": MEAL_PLAN["week_plan"]},
+    {"week_plan": MEAL_PLAN["week_plan"], "preferences": ["Standard"]},
+    {"week_plan": MEAL_PLAN["week_plan"], "preferences": {**PREFERENCES, "user_profile": None}},
+    {"week_plan": MEAL_PLAN["week_plan"], "preferences": {"plan_duration": "1-Day Meal Plan"}},
+    {"week_plan": {}, "preferences": PREFERENCES},
+    {"week_plan": {"monday": []}, "preferences": PREFERENCES},
+    {"week_plan": {"monday": "x"}, "preferences": PREFERENCES},
+    {"week_plan": {"monday": {"lunch": "Salad"}}, "preferences": PREFERENCES},
+    {"week_plan": {"monday": {"lunch": {"ingredients": "spinach"}}}, "preferences": PREFERENCES},
+    {"week_plan": {"monday": {"lunch": {"ingredients": [1, 2]}}}, "preferences": PREFERENCES},
+    {"week_plan": {"monday": {"lunch": {"ingredients": [], "instructions": "Toss"}}}, "preferences": PREFERENCES},
+])
+def test_rejects_malformed_plans(payload):
+    snapshot, error = decode_plan_snapshot(raw_snapshot(payload))
+
+    assert snapshot is None
+    assert error.startswith("Invalid plan file")
@@ -0,0 +1,84 @@
+import json
+
+import httpx
+import pytest
+
+from app import build_prompt_prefix, construct_llm_prompt, get_meal_plan_from_llm
+
+SHAPES = [
+    ("1-Day Meal Plan", "🌅 Breakfast, Lunch, Dinner", 1, ("breakfast", "lunch", "dinner")),
+    ("1-Day Meal Plan", "Lunch, Dinner", 1, ("lunch", "dinner")),
+    ("3-Day Meal Plan", "🌅 Breakfast, Lunch, Dinner", 3, ("breakfast", "lunch", "dinner")),
+    ("3-Day Meal Plan", "Lunch, Dinner", 3, ("lunch", "dinner")),
+]
+
+
+def preferences(plan_duration, meals_per_day, user_profile="Standard Healthy Eating", excluded_foods=""):
+    return {"user_profile": user_profile, "excluded_foods": excluded_foods,
+            "plan_duration": plan_duration, "meals_per_day": meals_per_day}
+
+
+@pytest.mark.parametrize("plan_duration, meals_per_day, num_days, meal_list", SHAPES)
+def test_prompts_of_one_shape_share_the_whole_prefix(plan_duration, meals_per_day, num_days, meal_list):
+    prefix = build_prompt_prefix(num_days, meal_list)
+
+    standard = construct_llm_prompt(preferences(plan_duration, meals_per_day))
+    vegetarian = construct_llm_prompt(preferences(plan_duration, meals_per_day, "🌱 Vegetarian", "peanuts"))
+
+    assert standard.encode("utf-8").startswith(prefix.encode("utf-8"))
+    assert vegetarian.encode("utf-8").startswith(prefix.encode("utf-8"))
+    assert standard != vegetarian
+
+
+@pytest.mark.parametrize("plan_duration, meals_per_day, num_days, meal_list", SHAPES)
+def test_user_constraints_come_after_the_prefix(plan_duration, meals_per_day, num_days, meal_list):
+    prefix = build_prompt_prefix(num_days, meal_list)
+
+    prompt = construct_llm_prompt(
+        preferences(plan_duration, meals_per_day, "Gluten-Free", "anchovies and olives")
+    )
+
+    assert "anchovies and olives" not in prefix
+    assert "barley, rye" not in prefix
+    assert "anchovies and olives" in prompt[len(prefix):]
+    assert "barley, rye" in prompt[len(prefix):]
+
+
+@pytest.mark.parametrize("plan_duration, meals_per_day, num_days, meal_list", SHAPES)
+def test_schema_lists_the_days_and_meals_of_the_shape(plan_duration, meals_per_day, num_days, meal_list):
+    prompt = construct_llm_prompt(preferences(plan_duration, meals_per_day))
+
+    schema_line = prompt.split("JSON STRUCTURE:\n", 1)[1].splitlines()[0]
+    week_plan = json.loads(schema_line)["week_plan"]
+
+    assert list(week_plan) == ["monday", "tuesday", "wednesday"][:num_days]
+    for day_meals in week_plan.values():
+        assert tuple(day_meals) == meal_list
+
+
+def test_prompt_tolerates_missing_profile():
+    prompt = construct_llm_prompt({"plan_duration": "1-Day Meal Plan"})
+
+    assert "DIETARY REQUIREMENTS" in prompt
+
+
+def test_cached_tokens_are_read_from_prompt_token_details(monkeypatch):
+    chunks = [
+        {"choices": [{"delta": {"content": "{}"}}]},
+        {"choices": [], "usage": {"prompt_tokens": 1200, "completion_tokens": 40,
+                                  "prompt_tokens_details": {"cached_tokens": 1024}}},
+    ]
+    body = "".join(f"data: {json.dumps(chunk)}\n\n" for chunk in chunks) + "data: [DONE]\n\n"
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, text=body))
+    real_client = httpx.Client
+    monkeypatch.setattr(httpx, "Client", lambda **kwargs: real_client(transport=transport, **kwargs))
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setenv("LLM_PROVIDER", "openai")
+
+    stats = {}
+    content, error = get_meal_plan_from_llm("prompt", "gpt-4o-mini", stats=stats)
+
+    assert error is None
+    assert content == "{}"
+    assert stats["prompt_tokens"] == 1200
+    assert stats["cached_tokens"] == 1024
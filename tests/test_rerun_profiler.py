@@ -0,0 +1,82 @@
+import threading
+import time
+
+from app import RerunProfiler
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def run_in_thread(target):
+    thread = threading.Thread(target=target)
+    thread.start()
+    thread.join()
+
+
+def test_finished_rerun_writes_report_and_flame_stacks(tmp_path):
+    profiler = RerunProfiler(tmp_path)
+
+    def rerun():
+        profiler.start("onboarding")
+        busy(0.1)
+        profiler.lap("busy section")
+        profiler.finish("plan_view")
+
+    run_in_thread(rerun)
+
+    report = next(profiler.output_dir.glob("*.txt")).read_text()
+    assert "onboarding -> plan_view" in report
+    assert "busy section" in report
+    assert "busy (test_rerun_profiler.py" in report
+    assert next(profiler.output_dir.glob("*.folded")).read_text()
+    assert not profiler.active
+
+
+def test_samples_only_the_profiled_thread(tmp_path):
+    profiler = RerunProfiler(tmp_path)
+    other = threading.Thread(target=busy, args=(0.3,))
+    other.start()
+
+    def rerun():
+        profiler.start("onboarding")
+        time.sleep(0.1)
+        profiler.finish("onboarding")
+
+    run_in_thread(rerun)
+    other.join()
+
+    stacks = next(profiler.output_dir.glob("*.folded")).read_text()
+    assert "busy (" not in stacks
+
+
+def test_rerun_that_never_finishes_is_closed_when_its_thread_exits(tmp_path):
+    profiler = RerunProfiler(tmp_path)
+
+    def failing_rerun():
+        profiler.start("generating")
+        busy(0.05)
+        # The script raised here, so finish() is never called
+
+    run_in_thread(failing_rerun)
+    deadline = time.monotonic() + 5
+    while profiler.active and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert not profiler.active
+    report = next(profiler.output_dir.glob("*.txt")).read_text()
+    assert "generating -> (script stopped early)" in report
+
+
+def test_debug_token_check_handles_non_ascii(monkeypatch):
+    import app
+
+    monkeypatch.setattr(app, "PROFILE_DEBUG_TOKEN", "s3cret")
+    monkeypatch.setattr(app.st, "query_params", {"debug": "é"})
+    assert not app.profile_toggle_unlocked()
+
+    monkeypatch.setattr(app, "PROFILE_DEBUG_TOKEN", "clé")
+    monkeypatch.setattr(app.st, "query_params", {"debug": "clé"})
+    assert app.profile_toggle_unlocked()